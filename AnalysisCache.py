@@ -0,0 +1,210 @@
+"""Cache of safety analyses keyed by the canonical form of the analyzed state.
+
+Two graphs that differ only in node positions or in how their processes and resources are
+numbered have the same canonical form: processes and resources are renumbered by colour
+refinement (a process is told apart by what it holds and requests of which kind of
+resource, a resource by its disponibilities and by which kind of process holds and requests
+it, repeated until no new kinds appear). The hash of the renumbered tables is the cache key,
+and the analysis is always run on the renumbered tables, so a cached answer is mapped back
+to the asking graph's own numbers. Finishing orders depend on the numbering, so they are
+redone on the asking graph with one sorted pass (finish_in_order): a hit returns what
+detect() would. A recovery plan's victims are one of the cheapest sets; when several cost
+the same, a hit may name another one than a fresh plan would.
+
+Processes the refinement cannot tell apart keep their relative order; very symmetric graphs
+numbered differently may therefore miss the cache, which only costs a recomputation.
+
+    cache = AnalysisCache("~/.cache/deadlock")   # or AnalysisCache() for memory only
+    result, plan = cache.analyze(tables)
+
+Entries live in an LRU in memory and, with a directory, as <dir>/<key[:2]>/<key>.json.
+"""
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+from DeadlockEngine import AnalysisResult, ResourceTables, detect, finish_in_order, sparse_rows
+from Instrumentation import instrumentation
+from RecoveryPlanner import RecoveryPlan, plan_recovery
+
+CACHE_VERSION = 2  # Part of every key: bump it when the stored analysis changes
+
+
+def _ranks(signatures):
+    """Colour of each signature: its rank among the distinct signatures."""
+    rank = {signature: colour for colour, signature in enumerate(sorted(set(signatures)))}
+    return [rank[signature] for signature in signatures]
+
+
+def _rows(matrix):
+    return matrix.tolist() if hasattr(matrix, "tolist") else matrix  # NumPy tables of binary scenarios
+
+
+class CanonicalForm:
+    def __init__(self, tables, processes, resources, entries):
+        self.tables = tables  # The tables renumbered: canonical process c is processes[c]
+        self.processes = processes
+        self.resources = resources
+        # entries: (process, resource, allocated, needed) of every non-zero cell, renumbered
+        self.digest = hashlib.sha256(json.dumps([tables.processes, tables.total, entries],
+                                                separators=(",", ":")).encode()).hexdigest()
+
+    def relabel(self, processes):
+        """Canonical process numbers back to the original ones."""
+        return [self.processes[process] for process in processes]
+
+
+def canonical_form(tables, max_rounds=16):
+    """Renumber the processes and resources of tables deterministically, ignoring their numbers."""
+    allocated, needed, total = _rows(tables.allocated), _rows(tables.needed), list(map(int, tables.total))
+    process_entries = [[(j, a, n) for j, a, n in zip(range(len(total)), held, requested) if a or n]
+                       for held, requested in zip(allocated, needed)]
+    resource_entries = [[] for _ in total]
+    for i, entries in enumerate(process_entries):
+        for j, a, n in entries:
+            resource_entries[j].append((i, a, n))
+
+    process_colours = [0] * len(process_entries)
+    resource_colours = _ranks(total)
+    for _ in range(max_rounds):
+        # The previous colour leads each signature, so a round only ever splits colours
+        new_processes = _ranks([(process_colours[i], tuple(sorted((resource_colours[j], a, n) for j, a, n in entries)))
+                                for i, entries in enumerate(process_entries)])
+        new_resources = _ranks([(resource_colours[j], tuple(sorted((new_processes[i], a, n) for i, a, n in entries)))
+                                for j, entries in enumerate(resource_entries)])
+        stable = (max(new_processes, default=0) == max(process_colours, default=0)
+                  and max(new_resources, default=0) == max(resource_colours, default=0))
+        process_colours, resource_colours = new_processes, new_resources
+        if stable:
+            break
+
+    processes = sorted(range(len(process_entries)), key=lambda i: (process_colours[i], i))
+    resources = sorted(range(len(total)), key=lambda j: (resource_colours[j], j))
+    position = {j: d for d, j in enumerate(resources)}
+    canonical_allocated = [[0] * len(total) for _ in processes]
+    canonical_needed = [[0] * len(total) for _ in processes]
+    entries = []
+    for c, i in enumerate(processes):
+        for j, a, n in sorted((position[j], a, n) for j, a, n in process_entries[i]):
+            canonical_allocated[c][j] = a
+            canonical_needed[c][j] = n
+            entries.append((c, j, a, n))
+    canonical_total = [total[j] for j in resources]
+    available = list(map(int, tables.available))
+    canonical = ResourceTables(canonical_allocated, canonical_needed,
+                               [available[j] for j in resources], canonical_total)
+    return CanonicalForm(canonical, processes, resources, entries)
+
+
+class AnalysisCache:
+    def __init__(self, directory=None, max_entries=256):
+        self.directory = os.path.expanduser(directory) if directory else None
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # Key -> stored analysis, least recently used first
+        self.hits = 0
+        self.misses = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def analyze(self, tables, mode="auto", backend="python", plan=True, progress=None):
+        """(result, plan) of detect(tables, mode, backend), from the cache when the state was seen.
+
+        plan is the recovery plan of an unsafe state (None when safe, or when plan=False).
+        progress, if given, follows an analysis that has to run: it is called as
+        progress(stage, done, total), stage being "safety" and then "recovery".
+        """
+        form = canonical_form(tables)
+        key = f"{form.digest}-{mode}-{backend}-{CACHE_VERSION}"
+        stored = self.get(key)
+        if stored is None:
+            self.misses += 1
+            instrumentation.count("cache.misses")
+            result = detect(form.tables, mode, backend, progress and functools.partial(progress, "safety"))
+            stored = {"deadlocked": result.deadlocked, "waves": result.waves, "cycles": result.cycles}
+            if result.safe:
+                stored["plan"] = None
+            self.put(key, stored)
+        else:
+            self.hits += 1
+            instrumentation.count("cache.hits")
+        if plan and "plan" not in stored:
+            planned = plan_recovery(form.tables, progress=progress and functools.partial(progress, "recovery"))
+            stored["plan"] = planned.to_dict()
+            self.put(key, stored)
+        return self._restore(form, tables, stored, plan)
+
+    def _restore(self, form, tables, stored, plan):
+        relabel = form.relabel
+        recovery = stored.get("plan") if plan else None
+        waves = stored["waves"]
+        if waves is None or recovery is not None:
+            # The safety loop and the wait-for graph both finish the lowest-numbered runnable
+            # process first, an order that depends on the numbering: redo it as a sorted pass
+            allocated, needed = sparse_rows(_rows(tables.allocated)), sparse_rows(_rows(tables.needed))
+            order, stuck, work = finish_in_order(allocated, needed, list(map(int, tables.available)),
+                                                 range(tables.processes))
+        if waves is not None:
+            waves = [sorted(relabel(wave)) for wave in waves]  # The numpy backend releases a wave in number order
+            safe_sequence = [process for wave in waves for process in wave]
+        else:
+            safe_sequence = order
+        cycles = stored["cycles"]
+        if cycles is not None:
+            cycles = sorted(sorted(relabel(cycle)) for cycle in cycles)
+        result = AnalysisResult(safe_sequence, sorted(relabel(stored["deadlocked"])), waves, cycles)
+
+        if recovery is not None:
+            victims = sorted(relabel(recovery["victims"]))
+            for process in victims:
+                for j, amount in allocated[process]:
+                    work[j] += amount
+            rest = finish_in_order(allocated, needed, work, [process for process in stuck if process not in victims])[0]
+            recovery = RecoveryPlan(victims, recovery["cost"], recovery["optimal"], order + rest)
+        return result, recovery
+
+    def get(self, key):
+        stored = self.entries.get(key)
+        if stored is not None:
+            self.entries.move_to_end(key)
+            return stored
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'r') as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            return None  # Not cached, or a damaged entry: analyze again
+        self._remember(key, stored)
+        return stored
+
+    def put(self, key, stored):
+        self._remember(key, stored)
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so concurrent batch workers never read half an entry
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump(stored, file, separators=(",", ":"))
+            os.replace(temporary, path)
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def _remember(self, key, stored):
+        self.entries[key] = stored
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,116 @@
+import queue
+import threading
+
+
+class Cancelled(Exception):
+    """Raised by BackgroundTask.check() inside the worker once the task was cancelled."""
+
+
+class BackgroundTask:
+    """Runs function(task) on a worker thread and delivers its outcome on the Tk thread.
+
+    The worker never touches Tk: progress messages, items and the result go through a queue that
+    the Tk thread polls with root.after, and the callbacks run there. Items sent with send() are
+    handed to on_item one per Tk tick; with max_pending, send() waits while that many messages
+    are queued, so a fast worker cannot run ahead of the Tk side. Cancellation is cooperative:
+    cancel() runs on_cancel at once and makes the worker's next check() or send() raise
+    Cancelled; whatever the worker still delivers is dropped. An exception from the worker or
+    from on_item ends the task through on_error (through cancel() when there is none).
+    """
+
+    def __init__(self, root, function, on_done, on_progress=None, on_error=None, on_cancel=None, on_item=None,
+                 poll_ms=50, max_pending=0):
+        self.root = root
+        self.function = function
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.on_item = on_item
+        self.poll_ms = poll_ms
+        self.cancelled = threading.Event()
+        self.messages = queue.Queue(max_pending)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.root.after(self.poll_ms, self._poll)
+        return self
+
+    # Called from the worker thread
+
+    def report(self, message):
+        self._put(("progress", message))
+
+    def send(self, item):
+        if not self._put(("item", item)):
+            raise Cancelled()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+    def _put(self, message):
+        # A full queue is waited on, but never past a cancel: the Tk side stops reading then
+        while not self.cancelled.is_set():
+            try:
+                self.messages.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self):
+        try:
+            result = self.function(self)
+        except Cancelled:
+            self._put(("cancelled", None))
+        except Exception as error:
+            self._put(("error", error))
+        else:
+            self._put(("done", result))
+
+    # Called from the Tk thread
+
+    def cancel(self):
+        if self.cancelled.is_set():
+            return
+        self.cancelled.set()
+        if self.on_cancel is not None:
+            self.on_cancel()
+
+    def _poll(self):
+        if self.cancelled.is_set():
+            return  # on_cancel already ran
+        while True:
+            try:
+                kind, value = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                if self.on_progress is not None:
+                    self.on_progress(value)
+                continue
+            if kind == "item":
+                try:
+                    self.on_item(value)
+                except Exception as error:
+                    self._fail(error)  # Never leave the task set with nobody polling it
+                    return
+                self.root.after(1, self._poll)  # One item per tick, so the window keeps redrawing
+                return
+            if kind == "cancelled":
+                self.cancel()  # The worker gave up by itself
+            elif kind == "error":
+                self._fail(value)
+            else:
+                self.on_done(value)
+            return
+        self.root.after(self.poll_ms, self._poll)
+
+    def _fail(self, error):
+        if self.on_error is None:
+            self.cancel()
+            return
+        self.on_error(error)
+        self.cancelled.set()  # Stops a worker that is still sending; on_error did the cleanup
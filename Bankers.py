@@ -1,5 +1,9 @@
+import heapq
+
+
 class Info:
     def __init__(self, process_name, has, max):
+        # has/max are a number (one resource type) or a list with one amount per resource type
         self.process_name = process_name
         self.has = has
         self.max = max
@@ -7,36 +11,95 @@ class Info:
     def __repr__(self):
         return f"Info(process_name={self.process_name}, has={self.has}, max={self.max})"
 
+
+class BankersResult:
+    def __init__(self, sequence, granted, remaining):
+        self.sequence = sequence  # Infos in the order they can run
+        self.granted = granted  # Resources added to each process of the sequence so it can run
+        self.remaining = remaining  # Infos that can never run
+
+    @property
+    def safe(self):
+        return not self.remaining
+
+    def __repr__(self):
+        return (f"BankersResult(safe={self.safe}, sequence={[info.process_name for info in self.sequence]}, "
+                f"remaining={[info.process_name for info in self.remaining]})")
+
+
 resource_amount = 10
 original_state = [Info("A", 3, 9), Info("B", 2, 4), Info("C", 2, 7)]
 
-def main():
-    run(original_state)
+def main(state, resource_amount):
+    result = run(state, resource_amount)
+    print_result(state, result, resource_amount)
+
+def as_vector(amount):
+    return list(amount) if isinstance(amount, (list, tuple)) else [amount]
 
-def run(state):
-    allocated_resources = calc_allocated_resources(state)
-    remaining_resources = resource_amount - allocated_resources
-    print_state(state, remaining_resources)
+def run(state, resource_amount):
+    """Find an order in which every process can get what it is missing, run and give it all back.
 
-    try:
-        info = find_desired(state, remaining_resources)
-        print(f"Adicionando {info.max - info.has} recursos ao Processo {info.process_name} e assim permitindo que ele rode")
-        run(remove(state, info))
-    except ValueError:
-        if not state:
-            print("Sem Deadlock :)")
-        else:
-            print("Deadlock")
+    Iterative, so it handles any number of processes: each resource type keeps the processes
+    still waiting on it sorted by how much they miss, and every release only wakes the
+    processes it now satisfies. Among the processes that can run, the first one in state
+    order is always picked, like find_desired. Does not modify state.
+    """
+    total = as_vector(resource_amount)
+    has = [as_vector(info.has) for info in state]
+    missing = [[maximum - held for maximum, held in zip(as_vector(info.max), holding)]
+               for info, holding in zip(state, has)]
+
+    available = list(total)
+    for holding in has:
+        for j, held in enumerate(holding):
+            available[j] -= held
+
+    waiting_count = [0] * len(state)  # Resource types a process is still waiting on
+    waiting = [[] for _ in total]  # Per resource type: (missing, process) still waiting, sorted
+    for i, needs in enumerate(missing):
+        for j, need in enumerate(needs):
+            if need > available[j]:
+                waiting[j].append((need, i))
+                waiting_count[i] += 1
+    for queue in waiting:
+        queue.sort()
+    woken = [0] * len(total)  # How far each waiting list has been satisfied
+
+    ready = [i for i, count in enumerate(waiting_count) if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for j, held in enumerate(has[i]):
+            available[j] += held
+            queue = waiting[j]
+            while woken[j] < len(queue) and queue[woken[j]][0] <= available[j]:
+                waiting_count[queue[woken[j]][1]] -= 1
+                if waiting_count[queue[woken[j]][1]] == 0:
+                    heapq.heappush(ready, queue[woken[j]][1])
+                woken[j] += 1
+
+    finished = set(order)
+    granted = [[max(need, 0) for need in missing[i]] for i in order]
+    return BankersResult([state[i] for i in order], granted, [info for i, info in enumerate(state) if i not in finished])
 
 def find_desired(state, remaining_resources):
     for info in state:
-        if info.has + remaining_resources >= info.max:
+        if all(held + remaining >= maximum for held, remaining, maximum
+               in zip(as_vector(info.has), as_vector(remaining_resources), as_vector(info.max))):
             return info
     raise ValueError("No process can proceed")
 
 def calc_allocated_resources(state):
+    if state and isinstance(state[0].has, (list, tuple)):
+        return [sum(amounts) for amounts in zip(*(info.has for info in state))]
     return sum(info.has for info in state)
 
+def format_amount(amount):
+    return amount[0] if len(amount) == 1 else amount
+
 def print_state(state, balance):
     print("")
     for info in state:
@@ -44,8 +107,26 @@ def print_state(state, balance):
     print(f"Saldo: {balance}")
     print("")
 
+def print_result(state, result, resource_amount):
+    remaining_state = list(state)
+    balance = as_vector(resource_amount)
+    for info in state:
+        balance = [amount - held for amount, held in zip(balance, as_vector(info.has))]
+
+    for info, granted in zip(result.sequence, result.granted):
+        print_state(remaining_state, format_amount(balance))
+        print(f"Adicionando {format_amount(granted)} recursos ao Processo {info.process_name} e assim permitindo que ele rode")
+        remaining_state = remove(remaining_state, info)
+        balance = [amount + held for amount, held in zip(balance, as_vector(info.has))]
+
+    print_state(remaining_state, format_amount(balance))
+    if result.safe:
+        print("Sem Deadlock :)")
+    else:
+        print("Deadlock")
+
 def remove(state, target):
     return [info for info in state if info.process_name != target.process_name]
 
 if __name__ == "__main__":
-    main()
+    main(original_state, resource_amount)
@@ -0,0 +1,158 @@
+"""Command-line batch analysis of many scenario files across a process pool.
+
+Usage:
+    python BatchAnalyzer.py scenarios/ --output results.jsonl
+    python BatchAnalyzer.py "captures/**/*.dlkb" --output results.csv --workers 8 --backend numpy
+    python BatchAnalyzer.py captures/ --cache ~/.cache/deadlock
+
+Writes one record per scenario (safe/unsafe, safe sequence, deadlocked processes, deadlock
+cycles, analysis time) as JSON Lines or CSV, in the order the scenarios were listed.
+With --cache, states already analyzed (in this run or an earlier one, under any numbering
+or layout) are answered from an AnalysisCache shared by the workers through its directory.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from AnalysisCache import AnalysisCache
+from DeadlockEngine import AnalysisResult, analyze_scenario, load_tables
+
+SCENARIO_EXTENSIONS = ('.json', '.jsonl', '.dlkb')
+CSV_FIELDS = ["scenario", "safe", "safe_sequence", "deadlocked", "cycles", "seconds", "error"]
+
+
+def collect_scenarios(inputs):
+    """Expand directories and glob patterns into a sorted, de-duplicated list of scenario files."""
+    paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        paths.extend(sorted(path for path in matches
+                            if path.endswith(SCENARIO_EXTENSIONS) and os.path.isfile(path)))
+    return list(dict.fromkeys(paths))
+
+
+_caches = {}  # Cache directory -> the AnalysisCache of this (worker) process
+
+
+def analyze_file(file_path, backend="python", mode="auto", cache_directory=None):
+    started = time.perf_counter()
+    try:
+        if cache_directory is None:
+            result = analyze_scenario(file_path, backend, mode)
+        else:
+            cache = _caches.get(cache_directory)
+            if cache is None:
+                cache = _caches[cache_directory] = AnalysisCache(cache_directory)
+            result = cache.analyze(load_tables(file_path), mode, backend, plan=False)[0]
+        record = result.to_dict()
+        record["error"] = None
+    except Exception as error:  # One broken capture must not stop the sweep
+        record = AnalysisResult.error_record(error)
+    record["seconds"] = round(time.perf_counter() - started, 6)
+    record["scenario"] = file_path
+    return record
+
+
+def _analyze_job(job):
+    return analyze_file(*job)
+
+
+class JsonLinesWriter:
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+
+
+class CsvWriter:
+    def __init__(self, file):
+        self.writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+        self.writer.writeheader()
+
+    def write(self, record):
+        row = dict(record)
+        for field in ("safe_sequence", "deadlocked"):
+            if row[field] is not None:
+                row[field] = " ".join(f"P{process}" for process in row[field])
+        if row["cycles"] is not None:
+            row["cycles"] = ";".join(" ".join(f"P{process}" for process in cycle) for cycle in row["cycles"])
+        self.writer.writerow({field: row.get(field) for field in CSV_FIELDS})
+
+
+def run_batch(paths, writer, workers=None, backend="python", mode="auto", chunksize=16, cache_directory=None):
+    """Analyze every path, writing records as they complete in input order. Returns summary counts."""
+    summary = {"safe": 0, "unsafe": 0, "failed": 0}
+    jobs = [(path, backend, mode, cache_directory) for path in paths]
+    if workers == 1:
+        records = map(_analyze_job, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        records = executor.map(_analyze_job, jobs, chunksize=chunksize)
+
+    try:
+        for record in records:
+            writer.write(record)
+            if record["error"] is not None:
+                summary["failed"] += 1
+            elif record["safe"]:
+                summary["safe"] += 1
+            else:
+                summary["unsafe"] += 1
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return summary
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Analyze scenario files for deadlocks in parallel.")
+    parser.add_argument("inputs", nargs="+", help="scenario directories, files or glob patterns")
+    parser.add_argument("-o", "--output", help="output file (default: standard output)")
+    parser.add_argument("-f", "--format", choices=("jsonl", "csv"),
+                        help="output format (default: from the output extension, else jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU, 1 runs in-process)")
+    parser.add_argument("--backend", choices=("python", "numpy"), default="python")
+    parser.add_argument("--mode", choices=("auto", "matrix", "wait-for"), default="auto")
+    parser.add_argument("--chunksize", type=int, default=16, help="scenarios sent to a worker at a time")
+    parser.add_argument("--cache", metavar="DIR", help="reuse analyses of already seen states kept in this directory")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_format = args.format
+    if output_format is None:
+        output_format = "csv" if args.output and args.output.endswith(".csv") else "jsonl"
+
+    paths = collect_scenarios(args.inputs)
+    if not paths:
+        print("No scenario files found.", file=sys.stderr)
+        return 1
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    started = time.perf_counter()
+    try:
+        writer = CsvWriter(output) if output_format == "csv" else JsonLinesWriter(output)
+        summary = run_batch(paths, writer, args.workers, args.backend, args.mode, args.chunksize, args.cache)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"Analyzed {len(paths)} scenarios in {time.perf_counter() - started:.2f} s: "
+          f"{summary['safe']} safe, {summary['unsafe']} unsafe, {summary['failed']} failed", file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Benchmark harness for the analysis pipeline.
+
+Times scenario import, table construction, the safety/detection step (the engine behind
+DeadlockApp.avoid_deadlock and Bankers.run) and the incremental detector's admission check
+(can_grant, asked by the GUI before every R -> P edge) on generated graphs of several sizes, and
+reports throughput and peak memory so regressions and scaling limits show up as numbers.
+
+Usage:
+    python Benchmark.py
+    python Benchmark.py --sizes 100x20,1000x100 --instances 1 --deadlock --json bench.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import Bankers
+from DeadlockEngine import (build_matrices, detect, find_safe_sequence, has_numpy, load_scenario, load_tables,
+                            single_instance)
+from GraphModel import AllocationIndex
+from IncrementalDetector import IncrementalDetector
+from ScenarioExporter import write_scenario
+from ScenarioGenerator import generate_scenario
+
+DEFAULT_SIZES = "50x10,200x40,1000x100,3000x300"
+GRANT_QUERIES = 200  # can_grant calls timed per size
+
+
+def measure(function, repeat):
+    """Best wall-clock time over repeat runs, then one extra run under tracemalloc for peak memory."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def bankers_state(processes, seed=None):
+    """A safe single-resource Bankers state: max - has fits in what is free at each process's turn."""
+    rng = random.Random(seed)
+    state = [Bankers.Info(f"P{i}", rng.randint(0, 3), 0) for i in range(processes)]
+    free = 5
+    for info in rng.sample(state, len(state)):
+        info.max = info.has + rng.randint(0, free)
+        free += info.has
+    return state, sum(info.has for info in state) + 5
+
+
+def fill_detector(nodes, edges):
+    detector = IncrementalDetector()
+    for node in nodes:
+        detector.add_node(node)
+    for edge in edges:
+        detector.add_edge(edge)
+    return detector
+
+
+def feed_detector(nodes, edges):
+    return fill_detector(nodes, edges).status()
+
+
+def grant_queries(detector, nodes, count, seed=None):
+    """count (resource, process) pairs: a resource with a free unit and a process requesting it."""
+    rng = random.Random(seed)
+    resources = [node for node in nodes if node.node_type == "R" and detector.available[node] >= 1]
+    processes = [node for node in nodes if node.node_type == "P"]
+    queries = []
+    for _ in range(count if resources else 0):
+        resource = rng.choice(resources)
+        queries.append((resource, rng.choice(list(detector.requesters[resource]) or processes)))
+    return queries
+
+
+def ask_detector(detector, queries):
+    return [detector.can_grant(resource, process) for resource, process in queries]
+
+
+def fill_index(edges):
+    index = AllocationIndex()
+    for edge in edges:
+        index.add_edge(edge)
+    return index
+
+
+def fresh(index):
+    index.invalidate()  # Time the one-pass build, not the cached tables
+    return index
+
+
+def benchmark_size(processes, resources, args, directory):
+    graph_data = generate_scenario(processes, resources, args.instances, args.density, args.deadlock,
+                                   args.adversarial, seed=args.seed)
+    edge_count = len(graph_data["edges"])
+    paths = {}
+    for extension in (".json", ".jsonl", ".dlkb"):
+        paths[extension] = os.path.join(directory, f"scenario_{processes}x{resources}{extension}")
+        write_scenario(graph_data, paths[extension])
+
+    nodes, edges = load_scenario(paths[".json"])
+    tables = build_matrices(nodes, edges)
+    index = fill_index(edges)
+
+    # (step, function, number of items processed for the throughput figure, unit)
+    steps = [
+        ("import json (GraphStore)", lambda: load_scenario(paths[".json"]), edge_count, "edges"),
+        ("import jsonl (tables)", lambda: load_tables(paths[".jsonl"]), edge_count, "edges"),
+        ("import dlkb (tables)", lambda: load_tables(paths[".dlkb"]), edge_count, "edges"),
+        ("build matrices (edges)", lambda: build_matrices(nodes, edges), edge_count, "edges"),
+        ("build matrices (index)", lambda: build_matrices(nodes, edges, fresh(index)), edge_count, "edges"),
+        ("safety python", lambda: find_safe_sequence(tables), processes, "processes"),
+    ]
+    if has_numpy():
+        steps.append(("safety numpy", lambda: detect(tables, "matrix", "numpy"), processes, "processes"))
+    if single_instance(tables):  # --adversarial gives R0 more than one instance
+        steps.append(("wait-for graph (Tarjan)", lambda: detect(tables, "wait-for"), processes, "processes"))
+    steps.append(("incremental detector", lambda: feed_detector(nodes, edges), edge_count, "events"))
+    detector = fill_detector(nodes, edges)
+    queries = grant_queries(detector, nodes, GRANT_QUERIES, args.seed)
+    steps.append(("can_grant (incremental)", lambda: ask_detector(detector, queries), len(queries), "queries"))
+    state, resource_amount = bankers_state(processes, args.seed)
+    steps.append(("Bankers.run (1 resource)", lambda: Bankers.run(state, resource_amount), processes, "processes"))
+
+    results = []
+    for name, function, items, unit in steps:
+        seconds, peak = measure(function, args.repeat)
+        results.append({
+            "processes": processes,
+            "resources": resources,
+            "edges": edge_count,
+            "step": name,
+            "seconds": seconds,
+            "throughput": items / seconds if seconds else float("inf"),
+            "unit": unit,
+            "peak_bytes": peak,
+        })
+    return results
+
+
+def parse_sizes(text):
+    sizes = []
+    for size in text.split(","):
+        processes, resources = size.lower().split("x")
+        sizes.append((int(processes), int(resources)))
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the deadlock analysis pipeline.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated PROCESSESxRESOURCES")
+    parser.add_argument("--instances", type=int, default=3, help="disponibilities per resource")
+    parser.add_argument("--density", type=float, default=0.05, help="chance of a request per (P, R) pair")
+    parser.add_argument("--deadlock", action="store_true", help="plant a deadlock in every scenario")
+    parser.add_argument("--adversarial", action="store_true", help="worst-case ordering for the safety loop")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per step (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also append the results to this JSON Lines file")
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>12} {'edges':>8}  {'step':<26} {'seconds':>10} {'throughput':>22} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for processes, resources in parse_sizes(args.sizes):
+            results = benchmark_size(processes, resources, args, directory)
+            for result in results:
+                print(f"{processes:>6}x{resources:<5} {result['edges']:>8}  {result['step']:<26} "
+                      f"{result['seconds']:>10.4f} {result['throughput']:>12.0f} {result['unit'] + '/s':<9} "
+                      f"{result['peak_bytes'] / 2 ** 20:>9.2f}")
+            sys.stdout.flush()
+            if args.json:
+                with open(args.json, 'a') as file:
+                    for result in results:
+                        file.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
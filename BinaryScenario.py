@@ -0,0 +1,250 @@
+"""Compact binary scenario format (.dlkb).
+
+Stores the same graph as the scenarios/*.json format as packed little-endian arrays:
+
+    header      magic b"DLKB", version (uint16), flags (uint16), node count (uint32), edge count (uint32)
+    node types  uint8 per node (0 = P, 1 = R), padded to a multiple of 4 bytes
+    numbers     int32 per node
+    capacities  int32 per node (disponibilities, 0 for processes)
+    edge starts int32 per edge (index of the start node in the node arrays)
+    edge ends   int32 per edge
+    x, y        float32 per node, only when the coordinates flag is set
+
+The loader memory-maps the file and, with NumPy installed, builds the allocation and need
+matrices straight from the mapped arrays without creating a Python object per edge.
+
+Usage: python BinaryScenario.py scenario.json scenario.dlkb
+"""
+import functools
+import importlib.util
+import mmap
+import struct
+import sys
+from array import array
+
+from ScenarioStream import iter_records, is_edge_record, node_key
+
+MAGIC = b"DLKB"
+VERSION = 1
+HAS_COORDINATES = 1
+HEADER = struct.Struct("<4sHHII")
+NODE_TYPES = {"P": 0, "R": 1}
+TYPE_NAMES = "PR"
+
+
+@functools.lru_cache(maxsize=None)
+def has_numpy():
+    """Whether NumPy is installed, found without importing it: the import is most of a cold start.
+
+    Without NumPy the arrays are read through memoryviews and only the python backend runs.
+    """
+    return importlib.util.find_spec("numpy") is not None
+
+
+def padded(size):
+    return (size + 3) // 4 * 4
+
+
+def write_binary(file_path, types, numbers, capacities, edge_starts, edge_ends, xs=None, ys=None):
+    """Write the packed arrays; types is a bytes-like of 0/1 values, the rest int/float sequences."""
+    if sys.byteorder != "little":
+        raise RuntimeError("The binary scenario writer only supports little-endian machines")
+    flags = HAS_COORDINATES if xs is not None else 0
+    with open(file_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, flags, len(types), len(edge_starts)))
+        file.write(bytes(types))
+        file.write(bytes(padded(len(types)) - len(types)))
+        for values, typecode in ((numbers, 'i'), (capacities, 'i'), (edge_starts, 'i'), (edge_ends, 'i')):
+            array(typecode, values).tofile(file)
+        if xs is not None:
+            array('f', xs).tofile(file)
+            array('f', ys).tofile(file)
+
+
+def export_records(records, file_path, coordinates=True):
+    """Write scenario records (see ScenarioStream) in the binary format."""
+    types = bytearray()
+    numbers = array('i')
+    capacities = array('i')
+    xs = array('f')
+    ys = array('f')
+    edge_starts = array('i')
+    edge_ends = array('i')
+    index_of = {}
+    for record in records:
+        if is_edge_record(record):
+            edge_starts.append(index_of[node_key(record['start_node'])])
+            edge_ends.append(index_of[node_key(record['end_node'])])
+            continue
+        index_of[node_key(record)] = len(types)
+        types.append(NODE_TYPES[record['type']])
+        numbers.append(record['number'])
+        capacities.append(record.get('disponibilities', 0))
+        xs.append(record.get('x', 0))
+        ys.append(record.get('y', 0))
+
+    write_binary(file_path, types, numbers, capacities, edge_starts, edge_ends,
+                 xs if coordinates else None, ys if coordinates else None)
+
+
+def export_graph(nodes, edges, file_path, coordinates=True):
+    """Write a Node/Edge graph (for example DeadlockApp.nodes/edges) in the binary format."""
+    index_of = {node: i for i, node in enumerate(nodes)}
+    write_binary(file_path,
+                 bytes(NODE_TYPES[node.node_type] for node in nodes),
+                 [node.number for node in nodes],
+                 [node.disponibilities for node in nodes],
+                 [index_of[edge.start] for edge in edges],
+                 [index_of[edge.end] for edge in edges],
+                 [node.x for node in nodes] if coordinates else None,
+                 [node.y for node in nodes] if coordinates else None)
+
+
+class BinaryScenario:
+    """A memory-mapped .dlkb file. Call close() (or use it as a context manager) when done."""
+
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.buffer) < HEADER.size:
+            self.buffer.close()
+            raise ValueError(f"{file_path} is not a version {VERSION} binary scenario")
+        magic, version, flags, self.node_count, self.edge_count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self.buffer.close()
+            raise ValueError(f"{file_path} is not a version {VERSION} binary scenario")
+        size = HEADER.size + padded(self.node_count) + 8 * self.node_count + 8 * self.edge_count
+        if flags & HAS_COORDINATES:
+            size += 8 * self.node_count
+        if len(self.buffer) < size:
+            self.buffer.close()  # Memoryviews would silently come up short
+            raise ValueError(f"{file_path} is truncated: {len(self.buffer)} of {size} bytes")
+
+        offset = HEADER.size
+        self.types = self._view('B', offset, self.node_count)
+        offset += padded(self.node_count)
+        self.numbers = self._view('i', offset, self.node_count)
+        offset += 4 * self.node_count
+        self.capacities = self._view('i', offset, self.node_count)
+        offset += 4 * self.node_count
+        self.edge_starts = self._view('i', offset, self.edge_count)
+        offset += 4 * self.edge_count
+        self.edge_ends = self._view('i', offset, self.edge_count)
+        offset += 4 * self.edge_count
+        self.xs = self.ys = None
+        if flags & HAS_COORDINATES:
+            self.xs = self._view('f', offset, self.node_count)
+            self.ys = self._view('f', offset + 4 * self.node_count, self.node_count)
+
+    def _view(self, typecode, offset, count):
+        if has_numpy():
+            import numpy as np
+            return np.frombuffer(self.buffer, dtype=np.dtype(typecode).newbyteorder('<'), count=count, offset=offset)
+        return memoryview(self.buffer)[offset:offset + struct.calcsize(typecode) * count].cast(typecode)
+
+    def close(self):
+        # Drop the views first: the map can't be closed while arrays still point into it
+        self.types = self.numbers = self.capacities = self.edge_starts = self.edge_ends = None
+        self.xs = self.ys = None
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def matrices(self):
+        """Return (allocated, needed, available, total), following DeadlockApp.add_edge's rules.
+
+        Only P -> R and R -> P edges count, and R -> P edges beyond a resource's
+        disponibilities are ignored, as the GUI refuses them. With NumPy the result is int32
+        arrays; without it, lists of lists.
+        """
+        if has_numpy():
+            return self._matrices_numpy()
+        return self._matrices_python()
+
+    def _matrices_numpy(self):
+        import numpy as np
+        types = self.types
+        numbers = self.numbers.astype(np.intp)
+        processes = int(np.count_nonzero(types == 0))
+        resources = self.node_count - processes
+        total = np.zeros(resources, dtype=np.int32)
+        is_resource = types == 1
+        total[numbers[is_resource]] = self.capacities[is_resource]
+
+        start_types = types[self.edge_starts]
+        end_types = types[self.edge_ends]
+        start_numbers = numbers[self.edge_starts]
+        end_numbers = numbers[self.edge_ends]
+
+        # Grants beyond a resource's disponibilities are dropped, in file order
+        grants = np.flatnonzero((start_types == 1) & (end_types == 0))
+        granted_resources = start_numbers[grants]
+        order = np.argsort(granted_resources, kind='stable')
+        sorted_resources = granted_resources[order]
+        group_starts = np.searchsorted(sorted_resources, sorted_resources, side='left')
+        rank = np.empty(len(grants), dtype=np.intp)
+        rank[order] = np.arange(len(grants)) - group_starts
+        grants = grants[rank < total[granted_resources]]
+
+        allocated = np.zeros((processes, resources), dtype=np.int32)
+        np.add.at(allocated, (end_numbers[grants], start_numbers[grants]), 1)
+
+        requests = (start_types == 0) & (end_types == 1)
+        needed = np.zeros((processes, resources), dtype=np.int32)
+        np.add.at(needed, (start_numbers[requests], end_numbers[requests]), 1)
+
+        available = total - allocated.sum(axis=0, dtype=np.int32)
+        return allocated, needed, available, total
+
+    def _matrices_python(self):
+        types = self.types
+        numbers = self.numbers
+        processes = sum(1 for node_type in types if node_type == 0)
+        resources = self.node_count - processes
+        total = [0] * resources
+        for i in range(self.node_count):
+            if types[i] == 1:
+                total[numbers[i]] = self.capacities[i]
+
+        allocated = [[0] * resources for _ in range(processes)]
+        needed = [[0] * resources for _ in range(processes)]
+        available = list(total)
+        for start, end in zip(self.edge_starts, self.edge_ends):
+            if types[start] == 1 and types[end] == 0:
+                resource = numbers[start]
+                if available[resource] > 0:
+                    available[resource] -= 1
+                    allocated[numbers[end]][resource] += 1
+            elif types[start] == 0 and types[end] == 1:
+                needed[numbers[start]][numbers[end]] += 1
+        return allocated, needed, available, total
+
+    def iter_records(self):
+        """Yield the scenario as node and edge records (for the GUI importer)."""
+        for i in range(self.node_count):
+            record = {"type": TYPE_NAMES[self.types[i]], "number": int(self.numbers[i])}
+            if self.types[i] == 1:
+                record["disponibilities"] = int(self.capacities[i])
+            if self.xs is not None:
+                record["x"] = float(self.xs[i])
+                record["y"] = float(self.ys[i])
+            yield record
+        for start, end in zip(self.edge_starts, self.edge_ends):
+            yield {"start_node": {"type": TYPE_NAMES[self.types[start]], "number": int(self.numbers[start])},
+                   "end_node": {"type": TYPE_NAMES[self.types[end]], "number": int(self.numbers[end])}}
+
+
+def iter_binary_records(file_path):
+    with BinaryScenario(file_path) as scenario:
+        yield from scenario.iter_records()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python BinaryScenario.py <scenario.json|scenario.jsonl> <output.dlkb>")
+        sys.exit(1)
+    export_records(iter_records(sys.argv[1]), sys.argv[2])
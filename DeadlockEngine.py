@@ -0,0 +1,447 @@
+"""Headless deadlock analysis engine.
+
+Runs the Banker's safety check on the same process/resource graph the GUI
+draws (a GraphModel.GraphStore) or on a scenario in the scenarios/*.json format.
+This module must not import tkinter, so it can run on machines without a
+display (batch jobs, services).
+
+NumPy is optional: it is only needed for the "numpy" backend, and only imported when that
+backend (or a binary scenario) is used, so the pure Python path starts without it.
+"""
+import heapq
+
+from BinaryScenario import BinaryScenario, has_numpy
+from GraphModel import EdgeSet, GraphStore
+from Instrumentation import instrumentation
+from ScenarioStream import iter_records, iter_scenario_records, is_edge_record, node_key
+from WaitForGraph import find_deadlocks
+
+
+class ResourceTables:
+    def __init__(self, allocated, needed, available, total):
+        self.allocated = allocated  # allocated[i][j]: units of Rj held by Pi (R -> P edges)
+        self.needed = needed  # needed[i][j]: units of Rj requested by Pi (P -> R edges)
+        self.available = available  # Free units of each resource
+        self.total = total  # Disponibilities of each resource
+
+    @property
+    def processes(self):
+        return len(self.allocated)
+
+    @property
+    def resources(self):
+        return len(self.total)
+
+    def total_allocated(self):
+        total_allocated_resources = [0] * self.resources
+        for row in self.allocated:
+            for j, amount in enumerate(row):
+                total_allocated_resources[j] += amount
+        return total_allocated_resources
+
+
+class AnalysisResult:
+    def __init__(self, safe_sequence, deadlocked, waves=None, cycles=None):
+        self.safe_sequence = safe_sequence  # Process numbers in the order they can run to completion
+        self.deadlocked = deadlocked  # Process numbers that can never finish
+        self.waves = waves  # Groups of processes released together (numpy backend only)
+        self.cycles = cycles  # Processes of each circular wait (wait-for mode only)
+
+    @property
+    def safe(self):
+        return not self.deadlocked
+
+    def to_dict(self):
+        return {
+            "safe": self.safe,
+            "safe_sequence": list(self.safe_sequence),
+            "deadlocked": list(self.deadlocked),
+            "cycles": self.cycles,
+        }
+
+    @staticmethod
+    def error_record(error):
+        """A to_dict() record, plus "error", for an analysis that raised: every field is None."""
+        record = dict.fromkeys(("safe", "safe_sequence", "deadlocked", "cycles"))
+        record["error"] = f"{type(error).__name__}: {error}"
+        return record
+
+    def __repr__(self):
+        return f"AnalysisResult(safe={self.safe}, safe_sequence={self.safe_sequence}, deadlocked={self.deadlocked})"
+
+
+def count_nodes(nodes):
+    processes = 0
+    resources = 0
+    for node in nodes:
+        if node.node_type == "R":
+            resources += 1
+        else:
+            processes += 1
+    return processes, resources
+
+
+@instrumentation.timed("build_matrices")
+def build_matrices(nodes, edges, index=None):
+    """Build the Allocation, Need and Available tables.
+
+    With an AllocationIndex the tables come from the index (one pass over its entries, or
+    nothing at all when the index already holds tables for the current graph); otherwise
+    they are built with a single pass over the edges, read straight from the store's arrays
+    when edges is a GraphStore's EdgeSet.
+    """
+    if index is not None and index.tables is not None:
+        instrumentation.count("build_matrices.cached")
+        return index.tables
+
+    processes, resources = count_nodes(nodes)
+
+    allocated = [[0] * resources for _ in range(processes)]
+    needed = [[0] * resources for _ in range(processes)]
+    if index is not None:
+        for (process, resource), amount in index.allocated.items():
+            allocated[process.number][resource.number] += amount
+        for (process, resource), amount in index.needed.items():
+            needed[process.number][resource.number] += amount
+    elif isinstance(edges, EdgeSet):
+        store = edges.store
+        if store.renumber_needed:
+            store.renumber()
+        types, numbers = store.types, store.numbers
+        for start, end, alive in zip(store.starts, store.ends, store.edge_alive):
+            if not alive:
+                continue
+            if types[start] == 1 and types[end] == 0:
+                allocated[numbers[end]][numbers[start]] += 1
+            elif types[start] == 0 and types[end] == 1:
+                needed[numbers[start]][numbers[end]] += 1
+    else:
+        for edge in edges:
+            if edge.start.node_type == "R" and edge.end.node_type == "P":
+                # When the edge starts in the Rj and ends in Pi, allocatedResources + 1
+                allocated[edge.end.number][edge.start.number] += 1
+            elif edge.start.node_type == "P" and edge.end.node_type == "R":
+                # When the edge starts in the Pi and ends in Rj, neededResources + 1
+                needed[edge.start.number][edge.end.number] += 1
+
+    total = [0] * resources
+    for node in nodes:
+        if node.node_type == "R":
+            total[node.number] += node.disponibilities
+
+    tables = ResourceTables(allocated, needed, None, total)
+    total_allocated_resources = tables.total_allocated()
+    tables.available = [total[j] - total_allocated_resources[j] for j in range(resources)]
+
+    if index is not None:
+        index.tables = tables
+    return tables
+
+
+def print_tables(tables):
+    print("\nAllocated Resources Table:")
+    for i, row in enumerate(tables.allocated):
+        print(f"P{i}: {row}")
+    print("\nNeeded Resources Table:")
+    for i, row in enumerate(tables.needed):
+        print(f"P{i}: {row}")
+
+    print("\nTotal Allocated Resources: " + str(tables.total_allocated()))
+    print("Total Available Resources: " + str(tables.available))
+    print("Total Resources: " + str(tables.total))
+
+
+def find_safe_sequence(tables, progress=None):
+    """Banker's safety loop: repeatedly run the first process whose needs fit in what is available.
+
+    progress, if given, is called as progress(finished, processes) before each pass; it may
+    raise to abandon the loop.
+    """
+    total_available_resources = list(tables.available)
+    remaining = list(range(tables.processes))
+
+    steps = []
+    checks = 0  # Need rows compared, for the instrumentation
+    while remaining:
+        if progress is not None:
+            progress(len(steps), tables.processes)
+        for position, process in enumerate(remaining):
+            needs = tables.needed[process]
+            if all(total_available_resources[j] >= needs[j] for j in range(tables.resources)):
+                # The process finishes and gives back everything it holds
+                allocation = tables.allocated[process]
+                for j in range(tables.resources):
+                    total_available_resources[j] += allocation[j]
+                del remaining[position]
+                steps.append(process)
+                checks += position + 1
+                break
+        else:
+            # If we've gone through all processes without finding a safe one, exit the loop
+            checks += len(remaining)
+            break
+
+    instrumentation.count("safety.iterations", len(steps))
+    instrumentation.count("safety.need_checks", checks)
+    return AnalysisResult(steps, remaining)
+
+
+def sparse_rows(matrix):
+    """(resource, amount) of the non-zero entries of each row of an Allocation or Need table."""
+    return [[(j, amount) for j, amount in enumerate(row) if amount] for row in matrix]
+
+
+def finish_in_order(allocated, needed, work, processes):
+    """Let every process that can run do so, lowest number first, as find_safe_sequence does.
+
+    allocated and needed are sparse rows (see sparse_rows), or rows of (resource key, amount)
+    with work a dict by resource key. Returns (finishing order, stuck processes, work
+    afterwards). Each resource keeps the processes waiting on it sorted by need, so a release
+    only looks at the processes it now satisfies.
+    """
+    work = dict(work) if isinstance(work, dict) else list(work)
+    waiting = {}
+    waiting_count = {}
+    ready = []
+    for process in processes:
+        count = 0
+        for j, amount in needed[process]:
+            if amount > work[j]:
+                waiting.setdefault(j, []).append((amount, process))
+                count += 1
+        waiting_count[process] = count
+        if count == 0:
+            ready.append(process)
+    for queue in waiting.values():
+        queue.sort()
+    woken = dict.fromkeys(waiting, 0)
+    heapq.heapify(ready)
+
+    order = []
+    while ready:
+        process = heapq.heappop(ready)
+        order.append(process)
+        for j, amount in allocated[process]:
+            work[j] += amount
+            queue = waiting.get(j)
+            if queue is None:
+                continue
+            while woken[j] < len(queue) and queue[woken[j]][0] <= work[j]:
+                waiter = queue[woken[j]][1]
+                waiting_count[waiter] -= 1
+                if waiting_count[waiter] == 0:
+                    heapq.heappush(ready, waiter)
+                woken[j] += 1
+    return order, [process for process in processes if waiting_count[process]], work
+
+
+def find_safe_sequence_sorted(tables):
+    """find_safe_sequence's answer, same order included, without its repeated scans."""
+    order, stuck, _ = finish_in_order(sparse_rows(tables.allocated), sparse_rows(tables.needed),
+                                      tables.available, range(tables.processes))
+    return AnalysisResult(order, stuck)
+
+
+def release_waves(tables, progress=None):
+    """Group the processes that can finish into waves, without NumPy.
+
+    A wave is every pending process whose needs fit in what the previous waves gave back, so
+    its processes could all run at the same time; the same grouping as find_safe_sequence_numpy.
+    progress is called as in find_safe_sequence, before each wave.
+    """
+    work = list(tables.available)
+    pending = list(range(tables.processes))
+    waves = []
+    while pending:
+        if progress is not None:
+            progress(tables.processes - len(pending), tables.processes)
+        wave = [process for process in pending
+                if all(work[j] >= tables.needed[process][j] for j in range(tables.resources))]
+        if not wave:
+            break
+        for process in wave:
+            for j, amount in enumerate(tables.allocated[process]):
+                work[j] += amount
+        released = set(wave)
+        pending = [process for process in pending if process not in released]
+        waves.append(wave)
+    return waves
+
+
+def to_arrays(tables):
+    """Allocation, Need and Available as int32 NumPy arrays."""
+    import numpy as np
+    shape = (tables.processes, tables.resources)
+    allocation = np.array(tables.allocated, dtype=np.int32).reshape(shape)
+    need = np.array(tables.needed, dtype=np.int32).reshape(shape)
+    available = np.array(tables.available, dtype=np.int32).reshape(tables.resources)
+    return allocation, need, available
+
+
+def find_safe_sequence_numpy(tables, progress=None):
+    """Vectorized safety check.
+
+    Each round compares the Need rows of every pending process against Available at once and
+    releases all satisfiable processes together, so there is one NumPy comparison per round
+    instead of a Python loop per process. The result has the same safe/deadlocked verdict as
+    find_safe_sequence, which stays as the reference implementation; only the order of the
+    safe sequence may differ. progress is called as in find_safe_sequence, before each round.
+    """
+    if not has_numpy():
+        raise RuntimeError("The numpy backend requires NumPy to be installed")
+    import numpy as np
+
+    allocation, need, work = to_arrays(tables)
+    pending = np.arange(tables.processes)
+
+    waves = []
+    while pending.size:
+        if progress is not None:
+            progress(tables.processes - pending.size, tables.processes)
+        runnable = np.all(need[pending] <= work, axis=1)
+        if not runnable.any():
+            break
+        wave = pending[runnable]
+        work += allocation[wave].sum(axis=0, dtype=np.int32)
+        pending = pending[~runnable]
+        waves.append(wave.tolist())
+        instrumentation.observe("safety.released_per_round", len(wave))
+
+    instrumentation.count("safety.iterations", len(waves))
+    steps = [process for wave in waves for process in wave]
+    return AnalysisResult(steps, pending.tolist(), waves)
+
+
+BACKENDS = {
+    "python": find_safe_sequence,
+    "numpy": find_safe_sequence_numpy,
+}
+
+
+def single_instance(tables):
+    return all(total == 1 for total in tables.total)
+
+
+@instrumentation.timed("safety")
+def detect(tables, mode="auto", backend="python", progress=None):
+    """Run the detection on built tables.
+
+    mode "matrix" runs the Banker's safety loop with the given backend, "wait-for" runs cycle
+    detection on the process wait-for graph (single-instance resources only) and "auto" picks
+    the wait-for graph whenever every resource has exactly one instance. progress goes to the
+    safety loop (see find_safe_sequence); the wait-for graph is linear and doesn't report.
+    """
+    if mode == "auto":
+        mode = "wait-for" if single_instance(tables) else "matrix"
+
+    if mode == "wait-for":
+        if not single_instance(tables):
+            raise ValueError("Wait-for graph detection needs every resource to have a single instance")
+        safe_sequence, deadlocked, cycles = find_deadlocks(tables)
+        instrumentation.count("safety.cycles", len(cycles))
+        return AnalysisResult(safe_sequence, deadlocked, cycles=cycles)
+    return BACKENDS[backend](tables, progress)
+
+
+def analyze(nodes, edges, index=None, backend="python", mode="auto"):
+    return detect(build_matrices(nodes, edges, index), mode, backend)
+
+
+def graph_from_records(records):
+    """Build a GraphStore (without canvas items) from scenario node and edge records.
+
+    Edges are accepted with the same rules as DeadlockApp.add_edge: only P -> R and R -> P
+    connections, and an R -> P edge only while the resource still has a free disponibility.
+    Nodes are looked up by (type, number), so building the graph is linear in its size.
+    Returns the store's NodeSet and EdgeSet.
+    """
+    store = GraphStore()
+    nodes_by_key = {}
+    for record in records:
+        if not is_edge_record(record):
+            node = store.add_node(record['type'], record['number'],
+                                  record.get('x', 0), record.get('y', 0), record.get('disponibilities', 0))
+            nodes_by_key[(node.node_type, node.number)] = node
+            continue
+
+        start = nodes_by_key[node_key(record['start_node'])]
+        end = nodes_by_key[node_key(record['end_node'])]
+        if start.node_type == "R" and end.node_type == "P":
+            available_dot = next((i for i, occupied in enumerate(start.occupied_dots) if not occupied), None)
+            if available_dot is not None:
+                start.occupied_dots[available_dot] = True
+                store.add_edge(start, end, dot_index=available_dot)
+        elif start.node_type == "P" and end.node_type == "R":
+            store.add_edge(start, end)
+
+    return store.nodes, store.edges
+
+
+def graph_from_scenario(graph_data):
+    return graph_from_records(iter_scenario_records(graph_data))
+
+
+@instrumentation.timed("import")
+def load_scenario(file_path):
+    return graph_from_records(iter_records(file_path))
+
+
+def tables_from_records(records):
+    """Build the analysis tables straight from scenario records, without Node/Edge objects.
+
+    Only per-(process, resource) counts are kept, so memory is bounded by the number of nodes
+    and distinct pairs rather than by the number of edges. Edges follow the same rules as
+    graph_from_records.
+    """
+    processes = 0
+    total = {}  # resource number -> disponibilities
+    allocated = {}  # (process, resource) -> units held
+    needed = {}  # (process, resource) -> units requested
+    held = {}  # resource number -> units handed out so far
+    for record in records:
+        if not is_edge_record(record):
+            if record['type'] == "R":
+                total[record['number']] = record.get('disponibilities', 0)
+            else:
+                processes += 1
+            continue
+
+        start_type, start_number = node_key(record['start_node'])
+        end_type, end_number = node_key(record['end_node'])
+        if start_type == "R" and end_type == "P":
+            if held.get(start_number, 0) < total[start_number]:
+                held[start_number] = held.get(start_number, 0) + 1
+                key = (end_number, start_number)
+                allocated[key] = allocated.get(key, 0) + 1
+        elif start_type == "P" and end_type == "R":
+            key = (start_number, end_number)
+            needed[key] = needed.get(key, 0) + 1
+
+    resources = len(total)
+    tables = ResourceTables([[0] * resources for _ in range(processes)],
+                            [[0] * resources for _ in range(processes)],
+                            None,
+                            [total[j] for j in range(resources)])
+    for (i, j), amount in allocated.items():
+        tables.allocated[i][j] = amount
+    for (i, j), amount in needed.items():
+        tables.needed[i][j] = amount
+    tables.available = [tables.total[j] - held.get(j, 0) for j in range(resources)]
+    return tables
+
+
+@instrumentation.timed("import")
+def load_tables(file_path):
+    """Build the analysis tables of a .json, .jsonl or .dlkb scenario file.
+
+    Binary scenarios are memory-mapped and, with NumPy, give int32 array tables that the
+    numpy backend uses as they are.
+    """
+    if file_path.endswith('.dlkb'):
+        with BinaryScenario(file_path) as scenario:
+            return ResourceTables(*scenario.matrices())
+    return tables_from_records(iter_records(file_path))
+
+
+def analyze_scenario(file_path, backend="python", mode="auto"):
+    return detect(load_tables(file_path), mode, backend)
@@ -0,0 +1,374 @@
+"""The process/resource graph, stored as parallel arrays.
+
+GraphStore keeps one entry per node in typed arrays (type, number, coordinates, capacity,
+canvas ids) and one per edge (start, end, dot, canvas line), addressed by integer ids that
+never change while the store lives. A node's number (P0, P1, ... R0, ...) is only its
+display index among the live nodes of its type, recomputed lazily after removals. Node and Edge are thin views over these arrays, so an
+edge costs a few bytes instead of a Python object with its own attribute dict, and code
+that only needs counts can read the arrays directly.
+"""
+import math
+from array import array
+
+NODE_TYPES = "PR"  # Type code -> node type, as in BinaryScenario (0 = process, 1 = resource)
+DOT_DISTANCE = 20  # Distance of a resource's disponibility dots from its center
+
+
+def _node_field(name, none=None):
+    """Property reading and writing node_id's entry of the store array called name.
+
+    When none is given, that stored value reads as None (and None is stored as it).
+    """
+    def get(self):
+        value = getattr(self.store, name)[self.node_id]
+        return None if value == none else value
+
+    def set(self, value):
+        getattr(self.store, name)[self.node_id] = none if value is None else value
+
+    return property(get, set)
+
+
+class Node:
+    """View of one node of a GraphStore. The store keeps a single view per node, so views
+    compare and hash by identity like the objects they replace."""
+
+    __slots__ = ("store", "node_id")
+
+    def __init__(self, store, node_id):
+        self.store = store
+        self.node_id = node_id
+
+    x = _node_field("xs")
+    y = _node_field("ys")
+    disponibilities = _node_field("capacities")
+    id = _node_field("shape_ids", none=0)  # Canvas item ids start at 1, so 0 means "not drawn"
+    text_id = _node_field("text_ids", none=0)
+
+    @property
+    def node_type(self):
+        return NODE_TYPES[self.store.types[self.node_id]]
+
+    @property
+    def number(self):
+        """Display index among the live nodes of this type; also the node's row or column in the tables."""
+        store = self.store
+        if store.renumber_needed:
+            store.renumber()
+        return store.numbers[self.node_id]
+
+    @property
+    def dot_ids(self):
+        return self.store.dot_ids.get(self.node_id, ())
+
+    @dot_ids.setter
+    def dot_ids(self, dot_ids):
+        if dot_ids:
+            self.store.dot_ids[self.node_id] = list(dot_ids)
+        else:
+            self.store.dot_ids.pop(self.node_id, None)
+
+    @property
+    def occupied_dots(self):
+        """One flag per disponibility (resources only), set while an R -> P edge uses the dot."""
+        return self.store.occupied.get(self.node_id, bytearray())
+
+    @occupied_dots.setter
+    def occupied_dots(self, flags):
+        self.store.occupied[self.node_id] = bytearray(flags)
+
+    def dot_position(self, index):
+        angle = 2 * math.pi * index / self.disponibilities
+        return self.x + DOT_DISTANCE * math.cos(angle), self.y + DOT_DISTANCE * math.sin(angle)
+
+    @property
+    def dot_positions(self):
+        """(x, y) of each disponibility dot, around the node's current position (resources only)."""
+        if self.node_type != "R":
+            return []
+        return [self.dot_position(i) for i in range(self.disponibilities)]
+
+    @property
+    def incident_edges(self):
+        """Edges that start or end at this node, oldest first."""
+        store = self.store
+        return [Edge(store, edge_id) for edge_id in store.incident(self.node_id)]
+
+    def __repr__(self):
+        return f"Node({self.node_type}{self.number})"
+
+
+class Edge:
+    """View of one edge of a GraphStore. Views are created on demand, so they compare and
+    hash by edge id."""
+
+    __slots__ = ("store", "edge_id")
+
+    def __init__(self, store, edge_id):
+        self.store = store
+        self.edge_id = edge_id
+
+    @property
+    def start(self):
+        return self.store.views[self.store.starts[self.edge_id]]
+
+    @property
+    def end(self):
+        return self.store.views[self.store.ends[self.edge_id]]
+
+    @property
+    def dot_index(self):
+        """Which dot of the start resource the edge leaves from (R -> P edges only)."""
+        dot_index = self.store.dot_indices[self.edge_id]
+        return None if dot_index < 0 else dot_index
+
+    @property
+    def line_id(self):
+        line_id = self.store.line_ids[self.edge_id]
+        return line_id or None
+
+    @line_id.setter
+    def line_id(self, line_id):
+        self.store.line_ids[self.edge_id] = line_id or 0
+
+    def __eq__(self, other):
+        return isinstance(other, Edge) and self.edge_id == other.edge_id and self.store is other.store
+
+    def __hash__(self):
+        return hash(self.edge_id)
+
+    def __repr__(self):
+        return f"Edge({self.start!r} -> {self.end!r})"
+
+
+class GraphStore:
+    def __init__(self):
+        self.nodes = NodeSet(self)
+        self.edges = EdgeSet(self)
+        self.clear()
+
+    def clear(self):
+        """Drop every node and edge; views of the old graph must not be used afterwards."""
+        # Per node
+        self.types = bytearray()
+        self.numbers = array('i')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.capacities = array('i')
+        self.shape_ids = array('i')
+        self.text_ids = array('i')
+        self.node_alive = bytearray()
+        self.live_nodes = 0
+        self.renumber_needed = False  # A node was removed since numbers were last assigned
+        self.views = []  # The Node view of each node id
+        self.dot_ids = {}  # Node id -> canvas ids of its dots, for drawn resources only
+        self.occupied = {}  # Node id -> bytearray of occupied dot flags, for resources only
+
+        # Per edge
+        self.starts = array('i')
+        self.ends = array('i')
+        self.dot_indices = array('i')  # -1 when the edge does not leave from a dot
+        self.line_ids = array('i')  # 0 while the edge has no canvas line
+        self.edge_alive = bytearray()
+        self.edge_count = 0
+
+        # Incidence in CSR form: adjacency[offsets[n]:offsets[n + 1]] holds the ids of the edges
+        # touching node n, for the edges older than indexed. Newer edges are listed per node in
+        # recent; the CSR arrays are rebuilt on a read once these are a sizeable share of the
+        # edges, so a bulk load never rebuilds. Removed edges are skipped on reads and dropped
+        # by the next rebuild.
+        self.offsets = array('i', [0])
+        self.adjacency = array('i')
+        self.indexed = 0
+        self.recent = {}  # Node id -> ids of its edges added since the last rebuild
+        self.removed = 0  # Removed edges still listed in adjacency
+
+    def add_node(self, node_type, number, x, y, disponibilities=0):
+        node_id = len(self.types)
+        self.types.append(NODE_TYPES.index(node_type))
+        self.numbers.append(number)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.capacities.append(disponibilities)
+        self.shape_ids.append(0)
+        self.text_ids.append(0)
+        self.node_alive.append(1)
+        self.live_nodes += 1
+        node = Node(self, node_id)
+        self.views.append(node)
+        if node_type == "R":
+            self.occupied[node_id] = bytearray(disponibilities)
+        return node
+
+    def remove_node(self, node):
+        """Remove a node whose edges were already removed; its id is not reused.
+
+        The later nodes of its type move down one number, which happens on the next read of
+        a number, so removing many nodes costs one pass instead of one per node.
+        """
+        self.node_alive[node.node_id] = 0
+        self.live_nodes -= 1
+        self.renumber_needed = True
+        self.dot_ids.pop(node.node_id, None)
+        self.occupied.pop(node.node_id, None)
+
+    def renumber(self):
+        """Number the live nodes of each type 0, 1, ... in the order they were added."""
+        counters = [0, 0]
+        types, numbers = self.types, self.numbers
+        for node_id, alive in enumerate(self.node_alive):
+            if alive:
+                node_type = types[node_id]
+                numbers[node_id] = counters[node_type]
+                counters[node_type] += 1
+        self.renumber_needed = False
+
+    def add_edge(self, start, end, dot_index=None):
+        edge_id = len(self.starts)
+        self.starts.append(start.node_id)
+        self.ends.append(end.node_id)
+        self.dot_indices.append(-1 if dot_index is None else dot_index)
+        self.line_ids.append(0)
+        self.edge_alive.append(1)
+        self.edge_count += 1
+        for node_id in (start.node_id, end.node_id):
+            recent = self.recent.get(node_id)
+            if recent is None:
+                recent = self.recent[node_id] = array('i')
+            recent.append(edge_id)
+        return Edge(self, edge_id)
+
+    def remove_edge(self, edge):
+        edge_id = edge.edge_id
+        if not self.edge_alive[edge_id]:
+            raise KeyError(edge)
+        self.edge_alive[edge_id] = 0
+        self.edge_count -= 1
+        if edge_id < self.indexed:
+            self.removed += 1
+            if self.removed > self.indexed // 2 + 64:
+                self._index()
+
+    def incident(self, node_id):
+        """Ids of the edges that start or end at node_id, oldest first."""
+        if len(self.starts) - self.indexed > self.indexed // 4 + 64:
+            self._index()  # Many edges were added since the last rebuild
+        alive = self.edge_alive
+        edge_ids = []
+        if node_id + 1 < len(self.offsets):
+            edge_ids = [edge_id for edge_id in self.adjacency[self.offsets[node_id]:self.offsets[node_id + 1]]
+                        if alive[edge_id]]
+        edge_ids.extend(edge_id for edge_id in self.recent.get(node_id, ()) if alive[edge_id])
+        return edge_ids
+
+    def _index(self):
+        """Rebuild the CSR incidence from the edge arrays (a counting sort by node)."""
+        alive = self.edge_alive
+        offsets = [0] * (len(self.types) + 1)
+        for edge_id, (start, end) in enumerate(zip(self.starts, self.ends)):
+            if alive[edge_id]:
+                offsets[start + 1] += 1
+                offsets[end + 1] += 1
+        for node_id in range(len(self.types)):
+            offsets[node_id + 1] += offsets[node_id]
+
+        adjacency = array('i', bytes(4 * offsets[-1]))
+        fill = offsets[:-1]
+        for edge_id, (start, end) in enumerate(zip(self.starts, self.ends)):
+            if alive[edge_id]:
+                adjacency[fill[start]] = edge_id
+                fill[start] += 1
+                adjacency[fill[end]] = edge_id
+                fill[end] += 1
+
+        self.offsets = array('i', offsets)
+        self.adjacency = adjacency
+        self.indexed = len(self.starts)
+        self.recent = {}
+        self.removed = 0
+
+
+class NodeSet:
+    """The live nodes of a GraphStore in the order they were added."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __contains__(self, node):
+        return node.store is self.store and self.store.node_alive[node.node_id] == 1
+
+    def __iter__(self):
+        views = self.store.views
+        for node_id, alive in enumerate(self.store.node_alive):
+            if alive:
+                yield views[node_id]
+
+    def __len__(self):
+        return self.store.live_nodes
+
+
+class EdgeSet:
+    """The live edges of a GraphStore in insertion order, as Edge views."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def remove(self, edge):
+        self.store.remove_edge(edge)
+
+    def __contains__(self, edge):
+        alive = self.store.edge_alive
+        return edge.store is self.store and edge.edge_id < len(alive) and alive[edge.edge_id] == 1
+
+    def __iter__(self):
+        store = self.store
+        for edge_id, alive in enumerate(store.edge_alive):
+            if alive:
+                yield Edge(store, edge_id)
+
+    def __len__(self):
+        return self.store.edge_count
+
+
+class AllocationIndex:
+    """Edge counts keyed by (process, resource) node pair, kept up to date as edges come and go.
+
+    Lets the analysis build its Allocation/Need tables in one pass over the index instead of
+    scanning every edge for every (process, resource) cell. The last tables built from the
+    index are cached until the graph changes.
+    """
+
+    def __init__(self):
+        self.allocated = {}  # (process, resource) -> number of R -> P edges
+        self.needed = {}  # (process, resource) -> number of P -> R edges
+        self.tables = None  # Tables built from the current state, if any
+
+    def add_edge(self, edge):
+        counts, key = self._counts_for(edge)
+        if counts is not None:
+            counts[key] = counts.get(key, 0) + 1
+            self.tables = None
+
+    def remove_edge(self, edge):
+        counts, key = self._counts_for(edge)
+        if counts is not None and key in counts:
+            counts[key] -= 1
+            if counts[key] == 0:
+                del counts[key]
+            self.tables = None
+
+    def invalidate(self):
+        """Drop the cached tables (nodes were added, removed, renumbered or resized)."""
+        self.tables = None
+
+    def clear(self):
+        self.allocated.clear()
+        self.needed.clear()
+        self.tables = None
+
+    def _counts_for(self, edge):
+        if edge.start.node_type == "R" and edge.end.node_type == "P":
+            return self.allocated, (edge.end, edge.start)
+        if edge.start.node_type == "P" and edge.end.node_type == "R":
+            return self.needed, (edge.start, edge.end)
+        return None, None
@@ -0,0 +1,539 @@
+"""Online deadlock detection for a stream of request/grant/release events.
+
+Instead of rebuilding the tables and re-running the safety loop after every change, the
+detector keeps a valid finishing order for the processes that can finish and, for the ones
+that cannot, the resources they are blocked on. Each event only re-checks the processes that
+request or hold the resource it touches. When a process's turn no longer works it is taken
+out of the order together with the later processes that relied on its release, and those are
+put back as soon as the remaining releases satisfy them.
+
+The same finishing order answers the Banker's admission question (can_grant) without
+touching the state: when the order can't absorb a grant as it is, it is replayed from the
+first turn that comes up short, visiting only the turns the grant can delay. A replay that
+that would cost more than one full safety pass gives way to that pass, run on a copy.
+
+Processes and resources can be any hashable keys (the GUI uses its Node objects).
+"""
+import heapq
+import itertools
+from bisect import bisect_left
+
+from DeadlockEngine import finish_in_order
+
+SAFE = "safe"  # Every process can run to completion
+UNSAFE = "unsafe"  # Some process can never finish, but not because of a circular wait
+DEADLOCKED = "deadlocked"  # Stuck processes wait on resources held by other stuck processes
+REPLAY_STEP_COST = 6  # A can_grant replay step costs about as much as this many entries of a safety pass
+
+
+class IncrementalDetector:
+    def __init__(self):
+        self.capacity = {}  # resource -> disponibilities
+        self.available = {}  # resource -> free units
+        self.allocated = {}  # process -> {resource: units held}
+        self.needed = {}  # process -> {resource: units requested}
+        self.holders = {}  # resource -> {process: units held}
+        self.requesters = {}  # resource -> {process: units requested}
+        self.entries = 0  # Non-zero requests and allocations: the size of one safety pass
+
+        self.position = {}  # process that can finish -> its place in the finishing order
+        self.next_position = 0
+        self.work = {}  # resource -> free units once every finishable process has released
+        self.ledgers = {}  # resource -> where its units come free along the finishing order (see _ledger)
+        self.blocked_on = {}  # process that cannot finish (yet) -> resources it waits for
+        self.waiting = {}  # resource -> heap of (units requested, tie, process) for blocked processes
+        self.waiting_count = {}  # resource -> number of processes blocked on it
+        self.contended = set()  # Resources with at least one blocked process
+        self.tie = itertools.count()  # Keeps heap entries comparable when processes are not
+        self.state = SAFE
+
+    def add_process(self, process):
+        self.allocated[process] = {}
+        self.needed[process] = {}
+        self._propagate([process])  # A process without edges can always finish
+        return self._update_state()
+
+    def add_resource(self, resource, capacity):
+        self.capacity[resource] = capacity
+        self.available[resource] = capacity
+        self.work[resource] = capacity
+        self.holders[resource] = {}
+        self.requesters[resource] = {}
+        self.waiting[resource] = []
+        self.waiting_count[resource] = 0
+        return self.state
+
+    def set_capacity(self, resource, capacity):
+        delta = capacity - self.capacity[resource]
+        self.capacity[resource] = capacity
+        self.available[resource] += delta
+        self.ledgers.pop(resource, None)
+        if delta >= 0:
+            self.work[resource] += delta
+            ready = []
+            self._wake(resource, ready)
+            self._propagate(ready)
+        else:
+            self._tighten(resource, -delta, None)
+        return self._update_state()
+
+    def request(self, process, resource):
+        """Pi asks for one more unit of Rj (a P -> R edge)."""
+        need = self.needed[process].get(resource, 0) + 1
+        self._set_need(process, resource, need)
+
+        if process in self.position:
+            # Only this process's place in the finishing order is affected
+            if need > self._work_before(resource, self.position[process]):
+                self._retract([process])
+        elif need > self.work[resource]:
+            self._block(process, resource)
+        return self._update_state()
+
+    def cancel_request(self, process, resource):
+        """A P -> R edge is removed."""
+        need = self.needed[process][resource] - 1
+        self._set_need(process, resource, need)
+
+        blocked = self.blocked_on.get(process)
+        if blocked is not None and resource in blocked:
+            if need <= self.work[resource]:
+                self._unblock(process, resource)
+                if not blocked:
+                    self._propagate([process])
+            else:
+                heapq.heappush(self.waiting[resource], (need, next(self.tie), process))
+        return self._update_state()
+
+    def grant(self, resource, process):
+        """One unit of Rj is allocated to Pi (an R -> P edge)."""
+        if self.available[resource] < 1:
+            raise ValueError("No available resources.")
+        self.available[resource] -= 1
+        self._add_allocation(process, resource, 1)
+
+        # Free units drop only up to the process's turn; after it they are given back
+        self._tighten(resource, 1, self.position.get(process))
+        return self._update_state()
+
+    def can_grant(self, resource, process, units=1):
+        """Would allocating units of Rj to Pi (R -> P edges) keep the system safe? Changes nothing.
+
+        Most queries are answered from the current finishing order by checking only the
+        processes that request Rj up to Pi's turn and Pi's own requests. Otherwise the order is
+        replayed from the first turn that comes up short, postponing the processes that no
+        longer fit, until the grant is absorbed (see _delay_turns); a replay that runs past the
+        cost of a whole safety pass is dropped for that pass (see _safe_with).
+        """
+        if self.available[resource] < units:
+            return False
+        if self.state != SAFE:
+            return False  # Taking resources away never makes an unsafe state safe
+
+        late = self._late_requesters(resource, self.position[process], units)
+        if not late:
+            return True
+
+        # Pi can also take its turn just before the first process that would come up short:
+        # everyone from there on gets back more than Pi took, so only Pi's requests need checking
+        first = min(self.position[other] for other in late)
+        if all(need <= self._work_before(needed_resource, first) - (units if needed_resource == resource else 0)
+               for needed_resource, need in self.needed[process].items()):
+            return True
+
+        # Nor can Pi ever finish if its request for Rj is more than the rest can give back
+        held = self.allocated[process].get(resource, 0) + units
+        if self.needed[process].get(resource, 0) + held > self.work[resource]:
+            return False
+
+        budget = (self.entries + len(self.allocated)) // REPLAY_STEP_COST
+        safe = self._delay_turns(resource, process, units, first, budget)
+        if safe is None:
+            return self._safe_with(resource, process, units)
+        return safe
+
+    def release(self, resource, process):
+        """Pi gives back one unit of Rj (an R -> P edge is removed)."""
+        self.available[resource] += 1
+        self._add_allocation(process, resource, -1)
+
+        if process not in self.position:
+            self.work[resource] += 1
+            ready = []
+            self._wake(resource, ready)
+            self._propagate(ready)
+        return self._update_state()
+
+    def remove_process(self, process):
+        blocked = self.blocked_on.pop(process, None)
+        for resource in list(self.needed[process]):
+            if blocked is not None and resource in blocked:
+                self._uncount(resource)
+            self._set_need(process, resource, 0)
+
+        finished = process in self.position
+        ready = []
+        for resource, amount in list(self.allocated[process].items()):
+            self.available[resource] += amount
+            self._add_allocation(process, resource, -amount)
+            if not finished:
+                self.work[resource] += amount
+                self._wake(resource, ready)
+
+        self.position.pop(process, None)
+        del self.allocated[process]
+        del self.needed[process]
+        self._propagate(ready)
+        return self._update_state()
+
+    def remove_resource(self, resource):
+        ready = []
+        for process in list(self.requesters[resource]):
+            blocked = self.blocked_on.get(process)
+            if blocked is not None and resource in blocked:
+                self._unblock(process, resource)
+                if not blocked:
+                    ready.append(process)
+            self._set_need(process, resource, 0)
+        for process, amount in list(self.holders[resource].items()):
+            self._add_allocation(process, resource, -amount)
+
+        for table in (self.capacity, self.available, self.work, self.holders, self.requesters,
+                      self.waiting, self.waiting_count):
+            del table[resource]
+        self.ledgers.pop(resource, None)
+        self.contended.discard(resource)
+        self._propagate(ready)
+        return self._update_state()
+
+    def clear(self):
+        self.__init__()
+
+    def add_node(self, node):
+        if node.node_type == "R":
+            return self.add_resource(node, node.disponibilities)
+        return self.add_process(node)
+
+    def remove_node(self, node):
+        if node.node_type == "R":
+            return self.remove_resource(node)
+        return self.remove_process(node)
+
+    def add_edge(self, edge):
+        if edge.start.node_type == "R":
+            return self.grant(edge.start, edge.end)
+        return self.request(edge.start, edge.end)
+
+    def remove_edge(self, edge):
+        if edge.start.node_type == "R":
+            return self.release(edge.start, edge.end)
+        return self.cancel_request(edge.start, edge.end)
+
+    def status(self):
+        return self.state
+
+    def safe_sequence(self):
+        """Processes that can finish, in a valid finishing order."""
+        return sorted(self.position, key=self.position.get)
+
+    def deadlocked(self):
+        return [process for process in self.allocated if process not in self.position]
+
+    def _set_need(self, process, resource, need):
+        self.ledgers.pop(resource, None)
+        self.entries += bool(need) - (resource in self.needed[process])
+        if need:
+            self.needed[process][resource] = need
+            self.requesters[resource][process] = need
+        else:
+            del self.needed[process][resource]
+            del self.requesters[resource][process]
+
+    def _add_allocation(self, process, resource, delta):
+        self.ledgers.pop(resource, None)
+        amount = self.allocated[process].get(resource, 0) + delta
+        self.entries += bool(amount) - (resource in self.allocated[process])
+        if amount:
+            self.allocated[process][resource] = amount
+            self.holders[resource][process] = amount
+        else:
+            del self.allocated[process][resource]
+            del self.holders[resource][process]
+
+    def _block(self, process, resource):
+        blocked = self.blocked_on[process]
+        if resource not in blocked:
+            blocked.add(resource)
+            self.waiting_count[resource] += 1
+            self.contended.add(resource)
+        need = self.needed[process][resource]
+        heapq.heappush(self.waiting[resource], (need, next(self.tie), process))
+
+    def _unblock(self, process, resource):
+        self.blocked_on[process].discard(resource)
+        self._uncount(resource)
+
+    def _uncount(self, resource):
+        self.waiting_count[resource] -= 1
+        if not self.waiting_count[resource]:
+            self.contended.discard(resource)
+
+    def _wake(self, resource, ready):
+        """Unblock the processes whose request for this resource now fits in work."""
+        heap = self.waiting[resource]
+        work = self.work[resource]
+        while heap and heap[0][0] <= work:
+            need, _, process = heapq.heappop(heap)
+            blocked = self.blocked_on.get(process)
+            if blocked is None or resource not in blocked or self.needed[process].get(resource) != need:
+                continue  # Stale entry: the process finished or its request changed since
+            self._unblock(process, resource)
+            if not blocked:
+                ready.append(process)
+
+    def _propagate(self, ready):
+        """Finish the ready processes and everything their released resources unblock."""
+        while ready:
+            process = ready.pop()
+            self.blocked_on.pop(process, None)
+            self.position[process] = self.next_position
+            self.next_position += 1
+            self._forget(process)
+            for resource, amount in self.allocated[process].items():
+                self.work[resource] += amount
+                self._wake(resource, ready)
+
+    def _work_before(self, resource, position):
+        """Free units of a resource when the process at this position gets its turn."""
+        work = self.available[resource]
+        for holder, amount in self.holders[resource].items():
+            if self.position.get(holder, position) < position:
+                work += amount
+        return work
+
+    def _forget(self, process):
+        """Drop the ledgers a process's move in the finishing order changes."""
+        for resource in itertools.chain(self.allocated[process], self.needed[process]):
+            self.ledgers.pop(resource, None)
+
+    def _ledger(self, resource):
+        """(turns, work, margins) of a resource along the finishing order, kept until it changes.
+
+        turns are the places of its finishable holders in order, work[k] the units free
+        before the turn turns[k] (work[-1]: after the last), and margins the (turn, process,
+        margin) of its finishable requesters by turn, margin being what is free in their
+        turn minus their request.
+        """
+        ledger = self.ledgers.get(resource)
+        if ledger is None:
+            finished = sorted((self.position[holder], amount) for holder, amount in self.holders[resource].items()
+                              if holder in self.position)
+            turns = [position for position, _ in finished]
+            work = [self.available[resource]]
+            for _, amount in finished:
+                work.append(work[-1] + amount)
+            margins = []
+            for process, need in self.requesters[resource].items():
+                position = self.position.get(process)
+                if position is not None:
+                    margins.append((position, process, work[bisect_left(turns, position)] - need))
+            margins.sort(key=lambda entry: entry[0])
+            ledger = self.ledgers[resource] = (turns, work, margins)
+        return ledger
+
+    def _late_requesters(self, resource, limit, shortfall=0):
+        """Finishable processes (up to position limit) whose request no longer fits in their turn.
+
+        shortfall is subtracted from the free units of every turn checked.
+        """
+        late = []
+        for position, process, margin in self._ledger(resource)[2]:
+            if limit is not None and position > limit:
+                break
+            if margin < shortfall:
+                late.append(process)
+        return late
+
+    def _delay_turns(self, granted, grantee, units, first, budget):
+        """Replay the finishing order from position first with units of granted given to grantee.
+
+        deficit holds, per resource, the units the order counted on that aren't free with the
+        grant (negative: free earlier than it counted on). A process whose requests no longer
+        fit in its turn is postponed, adding what it holds to the deficit, until enough comes
+        back; the grantee runs as soon as its requests fit, which only frees units earlier.
+        Once nothing is owed and nobody is postponed, the rest of the order works as it is.
+
+        Only turns that can come up short are visited: those whose margin on a resource is
+        below its deficit. A postponed process is woken at the turn whose release makes its
+        request fit, found in the resource's ledger.
+
+        Returns None once the turns visited, margins scanned and ledgers built exceed budget.
+        """
+        spent = [0]
+        deficit = {}
+        owed = set()  # Resources with a positive deficit
+        exposed = {}  # resource -> deficit up to which its later requesters are already due a visit
+        events = []  # Heap of (position, 0, tie, process) turns and (position, 1, tie, resource) releases
+        pending = {}  # resource -> position of its earliest release event still in events
+        visited = set()
+        waiting = {}  # resource -> heap of (units requested, tie, process) of postponed processes
+        postponed = {}  # postponed process -> resources it waits for
+
+        def ledger(resource):
+            if resource not in self.ledgers:
+                spent[0] += len(self.holders[resource]) + len(self.requesters[resource])
+            return self._ledger(resource)
+
+        def free(resource, position):
+            """Free units when the process at this position gets its turn."""
+            turns, work, _ = ledger(resource)
+            return work[bisect_left(turns, position)] - deficit.get(resource, 0)
+
+        def owe(resource, amount, position):
+            deficit[resource] = deficit.get(resource, 0) + amount
+            if deficit[resource] <= 0:
+                owed.discard(resource)
+                return
+            owed.add(resource)
+            if deficit[resource] > exposed.get(resource, 0):
+                margins = ledger(resource)[2]
+                start = bisect_left(margins, (position,))
+                spent[0] += len(margins) - start
+                for turn, process, margin in margins[start:]:
+                    if exposed.get(resource, 0) <= margin < deficit[resource] and process not in visited \
+                            and process != grantee:
+                        heapq.heappush(events, (turn, 0, next(self.tie), process))
+                exposed[resource] = deficit[resource]
+
+        def schedule(resource, position):
+            """Wake the resource's postponed processes at the turn whose release fits the first one."""
+            turns, work, _ = ledger(resource)
+            enough = bisect_left(work, waiting[resource][0][0] + deficit.get(resource, 0))
+            if enough < len(work) and position <= turns[enough - 1] < pending.get(resource, self.next_position):
+                pending[resource] = turns[enough - 1]
+                heapq.heappush(events, (turns[enough - 1], 1, next(self.tie), resource))
+
+        def postpone(process, position):
+            """Wait on the resources the process's requests don't fit in; False when none."""
+            needed = self.needed[process]
+            missing = {resource for resource, need in needed.items() if need > free(resource, position)}
+            for resource in missing:
+                heapq.heappush(waiting.setdefault(resource, []), (needed[resource], next(self.tie), process))
+                schedule(resource, position)
+            if missing:
+                postponed[process] = missing
+            return bool(missing)
+
+        def wake(resource, position, ready):
+            heap = waiting.get(resource)
+            while heap and heap[0][0] <= free(resource, position):
+                process = heapq.heappop(heap)[2]
+                missing = postponed.get(process)
+                if missing is not None and resource in missing:
+                    missing.discard(resource)
+                    if not missing:
+                        ready.append(process)
+            if heap:
+                schedule(resource, position)
+
+        def run_ready(ready, position):
+            while ready:
+                process = ready.pop()
+                del postponed[process]
+                if postpone(process, position):
+                    continue  # More is owed than when it was woken: wait again
+                released = list(self.allocated[process].items())
+                if process == grantee:
+                    released.append((granted, units))
+                for resource, amount in released:
+                    owe(resource, -amount, position)  # Given back later than the order counted on
+                    wake(resource, position, ready)
+
+        owe(granted, units, first)
+        heapq.heappush(events, (self.position[grantee], 0, next(self.tie), grantee))
+        postponed[grantee] = set()
+        run_ready([grantee], first)
+        while events and (postponed or owed):
+            spent[0] += 1
+            if spent[0] > budget:
+                return None
+            position, released, _, key = heapq.heappop(events)
+            ready = []
+            if released:
+                if pending.get(key) == position:
+                    del pending[key]
+                wake(key, position + 1, ready)
+            elif key == grantee:
+                # Its turn in the order: the release counted on here happened earlier or is pending
+                for resource, amount in self.allocated[key].items():
+                    owe(resource, amount, position + 1)
+            elif key not in visited:
+                visited.add(key)
+                if any(resource in owed and need > free(resource, position)
+                       for resource, need in self.needed[key].items()):
+                    for resource, amount in self.allocated[key].items():
+                        owe(resource, amount, position + 1)
+                    postpone(key, position)
+            run_ready(ready, position + 1)
+        return not postponed
+
+    def _safe_with(self, granted, grantee, units):
+        """can_grant by one sorted safety pass over a copy of the state with the grant applied."""
+        processes = list(self.allocated)
+        allocated = [self.allocated[process].items() for process in processes]
+        grantee = processes.index(grantee)
+        allocated[grantee] = [*allocated[grantee], (granted, units)]
+        needed = [self.needed[process].items() for process in processes]
+        work = dict(self.available)
+        work[granted] -= units
+        return not finish_in_order(allocated, needed, work, range(len(processes)))[1]
+
+    def _tighten(self, resource, units, limit):
+        """Free units of a resource dropped by units for every turn up to position limit (None: all)."""
+        if limit is None:
+            self.work[resource] -= units
+            for process, need in self.requesters[resource].items():
+                if process in self.blocked_on and need > self.work[resource] \
+                        and resource not in self.blocked_on[process]:
+                    self._block(process, resource)
+        self._retract(self._late_requesters(resource, limit))
+
+    def _retract(self, stack):
+        """Take processes out of the finishing order, along with the later ones that relied on them."""
+        retracted = []
+        while stack:
+            process = stack.pop()
+            if self.position.pop(process, None) is None:
+                continue
+            self._forget(process)
+            retracted.append(process)
+            for resource, amount in self.allocated[process].items():
+                self.work[resource] -= amount
+                for other, need in self.requesters[resource].items():
+                    if other not in self.position and other in self.blocked_on and need > self.work[resource] \
+                            and resource not in self.blocked_on[other]:
+                        self._block(other, resource)
+                # The later turns that counted on this release (one sorted pass per resource)
+                stack.extend(self._late_requesters(resource, None))
+
+        ready = []
+        for process in retracted:
+            self.blocked_on[process] = set()
+            for resource, need in self.needed[process].items():
+                if need > self.work[resource]:
+                    self._block(process, resource)
+            if not self.blocked_on[process]:
+                ready.append(process)
+        self._propagate(ready)
+
+    def _update_state(self):
+        if len(self.position) == len(self.allocated):
+            self.state = SAFE
+            return self.state
+
+        self.state = UNSAFE
+        for resource in self.contended:
+            if any(holder not in self.position for holder in self.holders[resource]):
+                self.state = DEADLOCKED
+                break
+        return self.state
@@ -0,0 +1,128 @@
+"""Optional timers and counters for the analysis pipeline.
+
+The pipeline reports to the module-level `instrumentation` object: phases (import, matrix
+build, safety check, animation) are timed, and counters and observed values (processes
+released per round, edges per animation step, ...) are accumulated. Nothing is recorded
+until it is enabled, so the calls cost one attribute check otherwise.
+
+    from Instrumentation import instrumentation, JsonLinesHook
+
+    instrumentation.enable()
+    instrumentation.add_hook(JsonLinesHook(open("events.jsonl", "w")))
+    ...
+    instrumentation.dump("stats.json")
+"""
+import functools
+import json
+import time
+from contextlib import contextmanager
+
+
+class JsonLinesHook:
+    """Hook that writes every event as one JSON object per line."""
+
+    def __init__(self, file):
+        self.file = file
+
+    def __call__(self, event, data):
+        self.file.write(json.dumps({"event": event, **data}) + "\n")
+        self.file.flush()
+
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.hooks = []  # Callables taking (event name, data dict)
+        self.reset()
+
+    def reset(self):
+        self.timings = {}  # Phase -> [calls, total seconds, longest call]
+        self.counters = {}  # Name -> total
+        self.observations = {}  # Name -> [count, total, minimum, maximum]
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def add_hook(self, hook):
+        """Call hook(event, data) for every phase and event; enables the instrumentation."""
+        self.hooks.append(hook)
+        self.enabled = True
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def emit(self, event, **data):
+        if self.enabled:
+            for hook in self.hooks:
+                hook(event, data)
+
+    @contextmanager
+    def phase(self, name, **details):
+        """Time the body of a with block as one call of phase name."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started, **details)
+
+    def timed(self, name):
+        """Decorator form of phase."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.phase(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_time(self, name, seconds, **details):
+        if not self.enabled:
+            return
+        timing = self.timings.setdefault(name, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+        self.emit("phase", phase=name, seconds=seconds, **details)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        """Accumulate one value of a distribution, such as the processes released in a round."""
+        if not self.enabled:
+            return
+        observation = self.observations.get(name)
+        if observation is None:
+            self.observations[name] = [1, value, value, value]
+        else:
+            observation[0] += 1
+            observation[1] += value
+            observation[2] = min(observation[2], value)
+            observation[3] = max(observation[3], value)
+
+    def stats(self):
+        return {
+            "timings": {name: {"calls": calls, "seconds": total, "longest": longest}
+                        for name, (calls, total, longest) in self.timings.items()},
+            "counters": dict(self.counters),
+            "observations": {name: {"count": count, "total": total, "mean": total / count, "min": low, "max": high}
+                             for name, (count, total, low, high) in self.observations.items()},
+        }
+
+    def dump(self, file_path):
+        with open(file_path, 'w') as file:
+            json.dump(self.stats(), file, indent=2)
+
+    def summary(self):
+        """One line per timed phase, for printing."""
+        return "\n".join(f"{name}: {calls} x, {total:.4f} s total, {longest:.4f} s longest"
+                         for name, (calls, total, longest) in self.timings.items())
+
+
+instrumentation = Instrumentation()
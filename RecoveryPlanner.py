@@ -0,0 +1,146 @@
+"""Deadlock recovery: which processes to preempt so the rest of the system can finish.
+
+Preempting a process (killing it, or rolling it back) gives everything it holds back to
+Available. A victim set is enough when the remaining processes then have a safe sequence.
+Victim sets are searched with branch-and-bound over the deadlocked processes only: the
+processes that can already finish never need to be preempted, and any useful victim is one
+that is still stuck after the current victims are released. A greedy plan (best units freed
+per cost, then with redundant victims dropped) gives the first upper bound, so a search cut
+short by its node budget still returns a good plan.
+"""
+from DeadlockEngine import finish_in_order, sparse_rows
+
+
+class RecoveryPlan:
+    def __init__(self, victims, cost, optimal, safe_sequence):
+        self.victims = victims  # Process numbers to preempt
+        self.cost = cost  # Sum of the victims' costs
+        self.optimal = optimal  # True when the search proved no cheaper victim set exists
+        self.safe_sequence = safe_sequence  # Order in which the other processes then finish
+
+    def to_dict(self):
+        return {
+            "victims": list(self.victims),
+            "cost": self.cost,
+            "optimal": self.optimal,
+            "safe_sequence": list(self.safe_sequence),
+        }
+
+    def __repr__(self):
+        return f"RecoveryPlan(victims={self.victims}, cost={self.cost}, optimal={self.optimal})"
+
+
+class RecoveryPlanner:
+    def __init__(self, tables, costs=None):
+        """costs maps a process number to the price of preempting it (default 1 each, so the
+        plan preempts as few processes as possible)."""
+        self.tables = tables
+        self.costs = [1] * tables.processes
+        if costs is not None:
+            for process, cost in (costs.items() if isinstance(costs, dict) else enumerate(costs)):
+                if cost < 0:
+                    raise ValueError(f"Preemption cost of P{process} must not be negative")
+                self.costs[process] = cost
+        self.allocated = sparse_rows(tables.allocated)
+        self.needed = sparse_rows(tables.needed)
+        self.nodes = 0  # Search nodes expanded by the last plan()
+
+    def finish(self, work, processes):
+        """Let every process that can run do so, lowest number first (see finish_in_order).
+
+        Returns (finishing order, stuck processes, work afterwards).
+        """
+        return finish_in_order(self.allocated, self.needed, work, processes)
+
+    def release(self, work, victims):
+        work = list(work)
+        for process in victims:
+            for j, amount in self.allocated[process]:
+                work[j] += amount
+        return work
+
+    def best_candidate(self, candidates, work, stuck):
+        """The candidate that frees the most units of the stuck processes' shortfall per unit of cost."""
+        shortfall = {}
+        for waiter in stuck:
+            for j, amount in self.needed[waiter]:
+                if amount > work[j]:
+                    shortfall[j] = shortfall.get(j, 0) + amount - work[j]
+
+        def score(process):
+            freed = 1 + sum(min(amount, shortfall.get(j, 0)) for j, amount in self.allocated[process])
+            return (freed / self.costs[process] if self.costs[process] else float("inf")), -process
+
+        return max(candidates, key=score)
+
+    def feasible(self, work, deadlocked, victims):
+        return not self.finish(self.release(work, victims), [p for p in deadlocked if p not in victims])[1]
+
+    def greedy(self, work, deadlocked):
+        victims = []
+        stuck = deadlocked
+        while True:
+            _, stuck, freed_work = self.finish(self.release(work, victims), [p for p in deadlocked if p not in victims])
+            if not stuck:
+                break
+            victims.append(self.best_candidate(stuck, freed_work, stuck))
+
+        # The later victims may have made earlier ones unnecessary: drop the most expensive first
+        for victim in sorted(victims, key=lambda process: -self.costs[process]):
+            rest = [process for process in victims if process != victim]
+            if self.feasible(work, deadlocked, set(rest)):
+                victims = rest
+        return victims
+
+    def plan(self, max_nodes=5000, progress=None):
+        """Find the cheapest victim set, expanding at most max_nodes search nodes.
+
+        progress, if given, is called as progress(nodes expanded, max_nodes) for every search
+        node; it may raise to abandon the search.
+        """
+        safe_order, deadlocked, work = self.finish(self.tables.available, list(range(self.tables.processes)))
+        if not deadlocked:
+            return RecoveryPlan([], 0, True, safe_order)
+
+        best = self.greedy(work, deadlocked)
+        best_cost = sum(self.costs[process] for process in best)
+
+        # Depth-first over (victims, their cost, stuck processes ruled out as victims on this
+        # branch, processes still stuck, work once everything else finished). Victims only add
+        # to the work, so a child continues from its parent's stuck processes.
+        stack = [((), 0, frozenset(), deadlocked, work)]
+        self.nodes = 0
+        while stack and self.nodes < max_nodes:
+            victims, cost, excluded, stuck, freed_work = stack.pop()
+            if progress is not None:
+                progress(self.nodes, max_nodes)
+            self.nodes += 1
+            if not stuck:
+                if cost < best_cost:
+                    best, best_cost = list(victims), cost
+                continue
+
+            candidates = [process for process in stuck if process not in excluded]
+            if not candidates:
+                continue
+            # At least one more victim is needed
+            if cost + min(self.costs[process] for process in candidates) >= best_cost:
+                continue
+            # Even preempting every remaining candidate must let the excluded processes finish
+            if self.finish(self.release(freed_work, candidates), [p for p in stuck if p in excluded])[1]:
+                continue
+
+            process = self.best_candidate(candidates, freed_work, stuck)
+            stack.append((victims, cost, excluded | {process}, stuck, freed_work))
+            _, child_stuck, child_work = self.finish(self.release(freed_work, [process]),
+                                                     [p for p in stuck if p != process])
+            stack.append((victims + (process,), cost + self.costs[process], excluded, child_stuck, child_work))
+
+        victim_set = set(best)
+        order, _, _ = self.finish(self.release(work, best), [p for p in deadlocked if p not in victim_set])
+        return RecoveryPlan(sorted(best), best_cost, not stack, safe_order + order)
+
+
+def plan_recovery(tables, costs=None, max_nodes=5000, progress=None):
+    """Cheapest set of processes to preempt so every other process can finish. See RecoveryPlanner."""
+    return RecoveryPlanner(tables, costs).plan(max_nodes, progress)
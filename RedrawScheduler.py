@@ -0,0 +1,71 @@
+class RedrawScheduler:
+    """Coalesces canvas updates so a frame moves each node and redraws each edge once.
+
+    Mouse-motion events only record the new position (or that the view scrolled/zoomed); the
+    canvas items are updated in flush, which Tk runs through after_idle once the pending
+    input events have been handled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.drawn_positions = {}  # Moved node -> (x, y) its canvas items are still drawn at
+        self.dirty_edges = {}  # Edges to recompute, in the order they were marked
+        self.view_changed = False  # Scrolled or zoomed: everything in view is recreated
+        self.labels_changed = False  # Nodes were renumbered: the drawn labels are rewritten
+        self.pending = None  # after_idle id of the scheduled flush
+
+    def move_node(self, node, x, y):
+        if node not in self.drawn_positions:
+            self.drawn_positions[node] = (node.x, node.y)
+        node.x = x
+        node.y = y
+        self.schedule()
+
+    def mark_edge(self, edge):
+        self.dirty_edges[edge] = None
+        self.schedule()
+
+    def mark_view(self):
+        self.view_changed = True
+        self.schedule()
+
+    def mark_labels(self):
+        self.labels_changed = True
+        self.schedule()
+
+    def forget_node(self, node):
+        self.drawn_positions.pop(node, None)
+
+    def forget_edge(self, edge):
+        self.dirty_edges.pop(edge, None)
+
+    def schedule(self):
+        if self.pending is None:
+            self.pending = self.app.root.after_idle(self.flush)
+
+    def cancel(self):
+        if self.pending is not None:
+            self.app.root.after_cancel(self.pending)
+            self.pending = None
+        self.drawn_positions.clear()
+        self.dirty_edges.clear()
+        self.view_changed = False
+        self.labels_changed = False
+
+    def flush(self):
+        self.pending = None
+        if self.view_changed:
+            self.app.render_view()
+        else:
+            for node, (drawn_x, drawn_y) in self.drawn_positions.items():
+                self.app.place_node(node, node.x - drawn_x, node.y - drawn_y)
+                for edge in node.incident_edges:
+                    self.dirty_edges[edge] = None
+            for edge in self.dirty_edges:
+                self.app.refresh_edge(edge)
+            if self.labels_changed:
+                self.app.relabel_nodes()
+        self.drawn_positions.clear()
+        self.dirty_edges.clear()
+        self.view_changed = False
+        self.labels_changed = False
@@ -1,15 +1,68 @@
 import tkinter as tk
 from tkinter import simpledialog, messagebox
+import argparse
 import random
 import math
-
+import time
+from collections import deque
+from functools import partial
+
+from AnalysisCache import AnalysisCache
+from BackgroundTask import BackgroundTask
+from DeadlockEngine import build_matrices, print_tables, release_waves
+from GraphModel import GraphStore, AllocationIndex
+from IncrementalDetector import IncrementalDetector, SAFE
+from Instrumentation import instrumentation, JsonLinesHook
+from RedrawScheduler import RedrawScheduler
+from ScenarioExporter import ScenarioExporter
 from ScenarioImporter import ScenarioImporter
+from SpatialIndex import SpatialIndex
+from Viewport import Viewport
+
+ANALYSIS_STAGES = {"safety": "Checking safety", "recovery": "Planning recovery", "waves": "Grouping waves"}
+
+
+def analyze_snapshot(tables, wave_mode, verbosity, task, cache, known=None):
+    """The worker half of "Avoid Deadlock": everything that only needs the tables.
+
+    known is a (result, plan) already computed for these tables, for example restored from a
+    snapshot; otherwise the AnalysisCache answers states it has seen and analyzes the others.
+    Runs on a BackgroundTask thread, so it must not touch the app or Tk.
+    """
+    shown = {}
+
+    def progress(stage, done, total):
+        task.check()  # Cancel stops the analysis between two steps
+        percent = done * 100 // total if total else 100
+        if shown.get(stage) != percent:
+            shown[stage] = percent
+            task.report(f"{ANALYSIS_STAGES[stage]}: {percent}%")
+
+    if verbosity >= 2:
+        print_tables(tables)
+    if known is not None:
+        result, plan = known
+    else:
+        task.report(f"{ANALYSIS_STAGES['safety']}...")
+        result, plan = cache.analyze(tables, progress=progress)
+        task.check()
+    if verbosity >= 1:
+        state = "safe" if result.safe else f"{len(result.deadlocked)} deadlocked"
+        print(f"{tables.processes} processes, {tables.resources} resources: {state}")
+    if wave_mode:
+        waves = result.waves or release_waves(tables, partial(progress, "waves"))
+    else:
+        waves = [[process] for process in result.safe_sequence]
+    return result, plan, waves
 
 
 class DeadlockApp:
-    def __init__(self, root):
+    def __init__(self, root, verbosity=1, cache_directory=None):
         self.root = root
+        self.verbosity = verbosity  # Console output of "Avoid Deadlock": 0 none, 1 a summary, 2 the full tables
+        self.analysis_cache = AnalysisCache(cache_directory)  # Only used by the single analysis task at a time
         self.importer = ScenarioImporter(self)  # Create instance of ScenarioImporter
+        self.exporter = ScenarioExporter(self)
         self.canvas = tk.Canvas(root, width=800, height=600)
         self.canvas.pack()
         self.root.title("Deadlock Analyzer")
@@ -17,23 +70,60 @@ class DeadlockApp:
         self.root.attributes("-fullscreen", False)
         self.p_counter = 0
         self.r_counter = 0
-        self.nodes = []
-        self.edges = []
-        self.dot_ids = []
-        self.dot_positions = []  # List of (x, y) tuples for each dot
-        self.occupied_dots = []  # List of booleans, True if dot is occupied
+        self.graph = GraphStore()  # Node and edge data; nodes and edges are views into it
+        self.nodes = self.graph.nodes
+        self.edges = self.graph.edges
+        self.allocation_index = AllocationIndex()  # (process, resource) edge counts for the analysis
+        self.detector = IncrementalDetector()  # Keeps the safety status current as the graph changes
+        self.spatial_index = SpatialIndex()  # Grid of node positions for click hit-testing
+        self.redraw = RedrawScheduler(self)  # Batches drag updates into one redraw per frame
+        self.viewport = Viewport(800, 600)  # Scroll offset and zoom; only nodes in view get canvas items
+        self.drawn_nodes = {}  # Nodes that currently have canvas items, in drawing order
+        self.edge_bundles = {}  # (start, end) -> [line_id, edge count] when zoomed out
+        self.parallel_edges = {}  # (process, resource) -> request edges between them, in drawing order
+        self.pan_start = None
         self.selected_node = None
         self.edge_start = None
+        self.last_result = None  # AnalysisResult of the last "Avoid Deadlock" run
+        self.last_plan = None  # RecoveryPlan for the processes the last run left deadlocked
+        self.last_analysis = None  # (tables, result, plan) of the last analysis or restored snapshot
+        self.planned_victims = []  # Process nodes the plan preempts, highlighted once the animation ends
+        self.victims = set()  # Process nodes currently highlighted as victims
+        self.playback = None  # (after id, highlighted edges, remaining steps) while a result is animated
+        self.playback_started = None  # perf_counter() when the current animation started
+        self.task = None  # BackgroundTask of the running import or analysis, if any
+        self.playback_delay = tk.IntVar(value=2000)  # Milliseconds each step stays highlighted
+        self.wave_mode = tk.BooleanVar(value=False)  # Release every simultaneously runnable process per step
         self.setup_ui()
         self.add_attribution()
         self.canvas.bind("<Button-1>", self.on_click) # Event listener
         self.canvas.bind("<B1-Motion>", self.on_drag) # Event listener
         self.canvas.bind("<Button-3>", self.change_disponibilities) # Event listener
+        self.canvas.bind("<Button-2>", self.start_pan) # Middle-drag scrolls the view
+        self.canvas.bind("<B2-Motion>", self.on_pan)
+        self.canvas.bind("<MouseWheel>", self.on_zoom) # Windows and macOS
+        self.canvas.bind("<Button-4>", self.on_zoom) # X11 wheel up
+        self.canvas.bind("<Button-5>", self.on_zoom) # X11 wheel down
 
     def setup_ui(self):
         import_button = tk.Button(self.root, text="Import Graph", command=self.importer.import_graph)
         import_button.pack(side=tk.RIGHT)
 
+        export_button = tk.Button(self.root, text="Export Graph", command=self.exporter.export_graph)
+        export_button.pack(side=tk.RIGHT)
+
+        snapshot_button = tk.Button(self.root, text="Save Snapshot", command=self.exporter.save_snapshot)
+        snapshot_button.pack(side=tk.RIGHT)
+
+        self.status_label = tk.Label(self.root, text="Status: safe")
+        self.status_label.pack(side=tk.RIGHT)
+
+        cancel_button = tk.Button(self.root, text="Cancel", command=self.cancel_task)
+        cancel_button.pack(side=tk.RIGHT)
+
+        self.progress_label = tk.Label(self.root, text="")
+        self.progress_label.pack(side=tk.RIGHT)
+
         add_p_button = tk.Button(self.root, text="Add Process (P)", command=self.add_process)
         add_p_button.pack(side=tk.LEFT)
 
@@ -52,6 +142,16 @@ class DeadlockApp:
         clear_button = tk.Button(self.root, text="Clear All", command=self.clear_all)
         clear_button.pack(side=tk.LEFT)
 
+        skip_button = tk.Button(self.root, text="Skip to End", command=self.skip_animation)
+        skip_button.pack(side=tk.LEFT)
+
+        wave_check = tk.Checkbutton(self.root, text="Waves", variable=self.wave_mode)
+        wave_check.pack(side=tk.LEFT)
+
+        speed_scale = tk.Scale(self.root, label="Step (ms)", from_=0, to=2000, resolution=100,
+                               orient=tk.HORIZONTAL, variable=self.playback_delay)
+        speed_scale.pack(side=tk.LEFT)
+
     def add_attribution(self):
         # anchor="e" aligns text to the right (east)
         self.canvas.create_text(780, 20, text="By Luigi G. Marchetti", anchor="e", font=("Arial", 10))
@@ -59,179 +159,285 @@ class DeadlockApp:
     def add_process(self, x=None, y=None):
         if not x or not y: # if x or y don't have value
             x, y = self.get_random_position()
-        node_id = self.canvas.create_rectangle(x - 25, y - 25, x + 25, y + 25, fill="white", outline="black")
-        text_id = self.canvas.create_text(x, y, text=f"P{self.p_counter}")
 
-        node = Node(node_id, text_id, "P", self.p_counter, x, y)
-        self.nodes.append(node)
+        node = self.graph.add_node("P", self.p_counter, x, y)
+        self.spatial_index.insert(node)
+        self.allocation_index.invalidate()
+        self.update_status(self.detector.add_node(node))
+        if self.viewport.contains(node):
+            self.draw_node(node)
 
         self.p_counter += 1
+        return node
 
     def add_resource(self):
-        x, y = self.get_random_position()
-        node_id = self.canvas.create_oval(x - 25, y - 25, x + 25, y + 25, fill="white", outline="black")
-        text_id = self.canvas.create_text(x, y, text=f"R{self.r_counter}")
-
         disponibilities = simpledialog.askinteger("Resource Disponibilities",
                                                   f"Enter number of disponibilities for R{self.r_counter}:",
                                                   minvalue=1, maxvalue=10)
 
         if disponibilities is None:  # User canceled the dialog
-            self.canvas.delete(node_id)
-            self.canvas.delete(text_id)
             return
 
-        node = Node(node_id, text_id, "R", self.r_counter, x, y, disponibilities)
-        self.nodes.append(node)
-        self.draw_disponibilities(node)
-
-        self.r_counter += 1
+        self.add_resource_with_disponibilities(disponibilities)
 
     def get_random_position(self):
-        return random.randint(50, 750), random.randint(50, 550)
+        # Somewhere in the part of the graph currently in view
+        x, y = self.viewport.to_world(random.randint(50, 750), random.randint(50, 550))
+        return round(x), round(y)
+
+    def draw_node(self, node):
+        """Create the canvas items of a node in view; labels and dots only when zoomed in."""
+        x, y = self.viewport.to_screen(node.x, node.y)
+        half_size = 25 * self.viewport.zoom
+        create_shape = self.canvas.create_rectangle if node.node_type == "P" else self.canvas.create_oval
+        fill = "orange" if node in self.victims else "white"
+        node.id = create_shape(x - half_size, y - half_size, x + half_size, y + half_size, fill=fill, outline="black")
+        if self.viewport.detailed:
+            node.text_id = self.canvas.create_text(x, y, text=f"{node.node_type}{node.number}")
+            self.draw_dots(node)
+        self.drawn_nodes[node] = None
+
+    def erase_node(self, node):
+        for item_id in (node.id, node.text_id, *node.dot_ids):
+            if item_id is not None:
+                self.canvas.delete(item_id)
+        node.id = None
+        node.text_id = None
+        node.dot_ids = ()
+        self.drawn_nodes.pop(node, None)
+
+    def place_node(self, node, dx, dy):
+        """Bring a moved node's canvas items up to date: move them, or create/delete them as it enters/leaves the view."""
+        if not self.viewport.contains(node):
+            self.erase_node(node)
+        elif node.id is None:
+            self.draw_node(node)
+        elif dx or dy:
+            zoom = self.viewport.zoom
+            for item_id in (node.id, node.text_id, *node.dot_ids):
+                if item_id is not None:
+                    self.canvas.move(item_id, dx * zoom, dy * zoom)
 
     def draw_disponibilities(self, node):
-        x, y = node.x, node.y
-        node.dot_positions = []
-        node.occupied_dots = [False] * node.disponibilities
-        for i in range(node.disponibilities):
-            angle = 2 * math.pi * i / node.disponibilities
-            dot_x = x + 20 * math.cos(angle)
-            dot_y = y + 20 * math.sin(angle)
-            dot_id = self.canvas.create_oval(dot_x - 3, dot_y - 3, dot_x + 3, dot_y + 3, fill="black")
-            node.dot_ids.append(dot_id)
-            node.dot_positions.append((dot_x, dot_y))
+        # The dots sit evenly around the node (see Node.dot_positions); all start free
+        node.occupied_dots = bytearray(node.disponibilities)
+        if node.id is not None:
+            self.draw_dots(node)
+
+    def draw_dots(self, node):
+        if not self.viewport.detailed:
+            return
+        radius = 3 * self.viewport.zoom
+        dot_ids = []
+        for dot_x, dot_y in node.dot_positions:
+            x, y = self.viewport.to_screen(dot_x, dot_y)
+            dot_ids.append(self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius, fill="black"))
+        node.dot_ids = dot_ids
 
     def change_disponibilities(self, event):
         # Only is enabled if there are no edges in canvas
         if len(self.edges) == 0:
-            node = self.find_node_at_position(event.x, event.y)
+            node = self.find_node_at_position(*self.viewport.to_world(event.x, event.y))
             if node and node.node_type == "R":
                 new_disponibilities = simpledialog.askinteger("Change Disponibilities",
                                                               f"Enter new number of disponibilities for R{node.number}:",
                                                               minvalue=1, maxvalue=10)
                 if new_disponibilities is not None:
                     node.disponibilities = new_disponibilities
+                    self.allocation_index.invalidate()
+                    self.update_status(self.detector.set_capacity(node, new_disponibilities))
                     for dot_id in node.dot_ids:
                         self.canvas.delete(dot_id)
-                    node.dot_ids.clear()
+                    node.dot_ids = ()
                     self.draw_disponibilities(node)
 
     def add_resource_with_disponibilities(self, disponibilities, x=None, y=None):
         if not x or not y:  # if x or y don't have value
             x, y = self.get_random_position()
-        node_id = self.canvas.create_oval(x - 25, y - 25, x + 25, y + 25, fill="white", outline="black")
-        text_id = self.canvas.create_text(x, y, text=f"R{self.r_counter}")
 
-        node = Node(node_id, text_id, "R", self.r_counter, x, y, disponibilities)
-        self.nodes.append(node)
+        node = self.graph.add_node("R", self.r_counter, x, y, disponibilities)
+        self.spatial_index.insert(node)
+        self.allocation_index.invalidate()
+        self.update_status(self.detector.add_node(node))
         self.draw_disponibilities(node)
+        if self.viewport.contains(node):
+            self.draw_node(node)
 
         self.r_counter += 1
+        return node
 
     def remove_node(self):
         if self.selected_node:
-            self.canvas.delete(self.selected_node.id)
-            self.canvas.delete(self.selected_node.text_id)
-            for dot_id in self.selected_node.dot_ids:
-                self.canvas.delete(dot_id)
-            self.nodes.remove(self.selected_node)
-            self.remove_connected_edges(self.selected_node)
+            self.delete_nodes([self.selected_node])
             self.selected_node = None
-            self.recalculate_indices()
 
-    def remove_connected_edges(self, node):
-        edges_to_remove = [edge for edge in self.edges if edge.start == node or edge.end == node]
+    def delete_nodes(self, nodes):
+        """Remove nodes and their edges. Each node only touches its own incident edges; the
+        other nodes' numbers and labels are brought up to date once, afterwards."""
+        for node in nodes:
+            self.erase_node(node)
+            self.victims.discard(node)
+            self.spatial_index.remove(node)
+            self.redraw.forget_node(node)
+            self.remove_connected_edges(node)
+            self.graph.remove_node(node)
+            self.update_status(self.detector.remove_node(node))
+            if node.node_type == "P":
+                self.p_counter -= 1
+            else:
+                self.r_counter -= 1
+        self.allocation_index.invalidate()  # The later nodes move down one row or column
+        self.redraw.mark_labels()
 
+    def remove_connected_edges(self, node):
         # Delete the graphical representation of the edges from the canvas
-        for edge in edges_to_remove:
-            self.canvas.delete(edge.line_id)
-
-        # Remove the edges from the edges list
-        self.edges = [edge for edge in self.edges if edge.start != node and edge.end != node]
+        for edge in node.incident_edges:
+            self.erase_edge(edge)
+            self.allocation_index.remove_edge(edge)
+            self.detector.remove_edge(edge)
+            self.ungroup_edge(edge)
+            self.redraw.forget_edge(edge)
+            self.edges.remove(edge)
 
-        self.redraw_edges()
-
-    def recalculate_indices(self):
-        p_counter = 0
-        r_counter = 0
-        for node in self.nodes:
-            if node.node_type == "P":
-                node.number = p_counter
-                self.canvas.itemconfig(node.text_id, text=f"P{p_counter}")
-                p_counter += 1
-            else:
-                node.number = r_counter
-                self.canvas.itemconfig(node.text_id, text=f"R{r_counter}")
-                r_counter += 1
-        self.p_counter = p_counter
-        self.r_counter = r_counter
+    def group_edge(self, edge):
+        if edge.start.node_type == "P":
+            self.parallel_edges.setdefault((edge.start, edge.end), []).append(edge)
+
+    def ungroup_edge(self, edge):
+        if edge.start.node_type == "P":
+            group = self.parallel_edges[(edge.start, edge.end)]
+            group.remove(edge)
+            if not group:
+                del self.parallel_edges[(edge.start, edge.end)]
+            for sibling in group:
+                self.redraw.mark_edge(sibling)  # The rest of the group curves differently now
+
+    def relabel_nodes(self):
+        """Rewrite the labels of the drawn nodes after nodes were removed and the rest renumbered."""
+        for node in self.drawn_nodes:
+            if node.text_id is not None:
+                self.canvas.itemconfig(node.text_id, text=f"{node.node_type}{node.number}")
 
     def start_add_edge(self):
         self.canvas.bind("<Button-1>", self.on_edge_click)
 
     def on_edge_click(self, event):
         self.selected_node = None # cleans selected node
-        clicked_node = self.find_node_at_position(event.x, event.y)
+        clicked_node = self.find_node_at_position(*self.viewport.to_world(event.x, event.y))
         if clicked_node:
             if not self.edge_start:
                 self.edge_start = clicked_node
             else:
-                self.add_edge(self.edge_start, clicked_node)
+                self.add_edge(self.edge_start, clicked_node, confirm_unsafe=True)
                 self.edge_start = None
                 self.canvas.bind("<Button-1>", self.on_click)
 
-    def add_edge(self, start, end):
+    def add_edge(self, start, end, confirm_unsafe=False):
         if start.node_type == "R" and end.node_type == "P":
             available_dot = next((i for i, occupied in enumerate(start.occupied_dots) if not occupied), None)
+            if available_dot is not None and confirm_unsafe and self.detector.status() == SAFE \
+                    and not self.detector.can_grant(start, end):
+                # Banker's admission check: warn before an allocation that leaves no safe sequence
+                if not messagebox.askyesno("Unsafe Allocation",
+                                           f"Granting R{start.number} to P{end.number} would leave the system "
+                                           f"in an unsafe state. Grant anyway?"):
+                    return
             if available_dot is not None:
-                edge = Edge(start, end, dot_index=available_dot)
-                self.edges.append(edge)
-                self.draw_edge(edge, start, end)
+                edge = self.graph.add_edge(start, end, dot_index=available_dot)
+                self.allocation_index.add_edge(edge)
+                self.update_status(self.detector.add_edge(edge))
+                self.draw_edge(edge)
                 start.occupied_dots[available_dot] = True
             else:
                 messagebox.showerror("Error", "No available resources.")
         elif start.node_type == "P" and end.node_type == "R":
-            edge = Edge(start, end)
-            self.edges.append(edge)
-            self.draw_edge(edge, start, end)
+            edge = self.graph.add_edge(start, end)
+            self.group_edge(edge)
+            self.allocation_index.add_edge(edge)
+            self.update_status(self.detector.add_edge(edge))
+            self.draw_edge(edge)
         else:
             messagebox.showerror("Error", "Invalid edge connection.")
 
-    def draw_edge(self, edge, start, end):
-        if start.node_type == "R":
-            # For edges starting from a resource, use the dot position
-            start_x, start_y = self.get_dot_position(start, edge.dot_index)
-            end_x, end_y = self.get_border_point(end, start.x, start.y)
+    def draw_edge(self, edge):
+        if edge.start.node_type == "P":
+            # A new parallel edge changes how the whole group curves; the older edges of the
+            # group are bent once per frame, however many edges join it meanwhile
+            for sibling in self.parallel_edges[(edge.start, edge.end)][:-1]:
+                self.redraw.mark_edge(sibling)
+        self.refresh_edge(edge)
+
+    def refresh_edge(self, edge):
+        """Create, move or delete an edge's line after its nodes changed or moved in/out of view.
+
+        An edge is drawn while at least one of its nodes is in view; edges that only cross the
+        view between two culled nodes are not drawn.
+        """
+        if edge.start.id is None and edge.end.id is None:
+            self.erase_edge(edge)
+        elif edge.line_id is None:
+            self.show_edge(edge)
         else:
-            # For edges starting from a process, use border points for both ends
-            start_x, start_y = self.get_border_point(start, end.x, end.y)
-            end_x, end_y = self.get_border_point(end, start.x, start.y)
-
-        # Count existing edges between these nodes
-        existing_edges = sum(1 for e in self.edges if
-                             e.start.node_type == "P" and
-                             (e.start == edge.start and e.end == edge.end))
-
-        if start.node_type == "P" and existing_edges > 1:
-            # Draw curved edge
-            curve = 0.2 * (existing_edges - 1)
-            mid_x = (start_x + end_x) / 2
-            mid_y = (start_y + end_y) / 2
-            control_x = mid_x - (start_y - end_y) * curve
-            control_y = mid_y + (start_x - end_x) * curve
-
-            # Creates a curved (smooth) line with 32 intermediate points and an arrow at the end of it
-            edge.line_id = self.canvas.create_line(start_x, start_y, control_x, control_y, end_x, end_y,
-                                                   smooth=True, arrow=tk.LAST, splinesteps=32)
+            self.update_edge_position(edge)
+
+    def show_edge(self, edge):
+        if self.viewport.detailed:
+            edge.line_id = self.canvas.create_line(0, 0, 0, 0, arrow=tk.LAST)
         else:
-            # Draw straight edge with an arrow at the end of it
-            edge.line_id = self.canvas.create_line(start_x, start_y, end_x, end_y, arrow=tk.LAST)
+            # Zoomed out: edges between the same two nodes share one line, thicker the more there are
+            bundle = self.edge_bundles.get((edge.start, edge.end))
+            if bundle is None:
+                bundle = self.edge_bundles[(edge.start, edge.end)] = [self.canvas.create_line(0, 0, 0, 0, arrow=tk.LAST), 0]
+            bundle[1] += 1
+            edge.line_id = bundle[0]
+            self.canvas.itemconfig(edge.line_id, width=self.viewport.bundle_width(bundle[1]))
+        self.update_edge_position(edge)
+
+    def erase_edge(self, edge):
+        if edge.line_id is None:
+            return
+        bundle = self.edge_bundles.get((edge.start, edge.end))
+        if bundle is not None and bundle[0] == edge.line_id:
+            bundle[1] -= 1
+            if bundle[1]:
+                self.canvas.itemconfig(edge.line_id, width=self.viewport.bundle_width(bundle[1]))
+                edge.line_id = None
+                return
+            del self.edge_bundles[(edge.start, edge.end)]
+        self.canvas.delete(edge.line_id)
+        edge.line_id = None
+
+    def render_view(self):
+        """Recreate the canvas items for the nodes in view and their edges, at the current zoom."""
+        for node in list(self.drawn_nodes):
+            for edge in node.incident_edges:
+                self.erase_edge(edge)
+            self.erase_node(node)
+        for node in self.spatial_index.query(*self.viewport.bounds()):
+            self.draw_node(node)
+        for node in self.drawn_nodes:
+            for edge in node.incident_edges:
+                if edge.line_id is None:
+                    self.show_edge(edge)
+
+    def start_pan(self, event):
+        self.pan_start = (event.x, event.y)
+
+    def on_pan(self, event):
+        if self.pan_start:
+            self.viewport.scroll(self.pan_start[0] - event.x, self.pan_start[1] - event.y)
+            self.pan_start = (event.x, event.y)
+            self.redraw.mark_view()
+
+    def on_zoom(self, event):
+        zoom_in = event.num == 4 or event.delta > 0
+        self.viewport.zoom_at(1.25 if zoom_in else 0.8, event.x, event.y)
+        self.redraw.mark_view()
 
     def get_dot_position(self, node, dot_index):
         """Retrieve the position of the specified dot for a given node."""
-        if dot_index is not None and 0 <= dot_index < len(node.dot_positions):
-            return node.dot_positions[dot_index]
+        if dot_index is not None and 0 <= dot_index < node.disponibilities:
+            return node.dot_position(dot_index)
         return node.x, node.y  # Fallback to the node's center if no dot is specified
 
     def get_border_point(self, node, x2, y2):
@@ -253,17 +459,22 @@ class DeadlockApp:
             scale = radius / dist
             return x1 + dx * scale, y1 + dy * scale
 
-    def redraw_edges(self):
-        for edge in self.edges:
-            self.update_edge_position(edge)
-
     def update_edge_position(self, edge):
+        if edge.line_id is None:
+            return  # Culled: neither node is in view
+        to_screen = self.viewport.points_to_screen
+        if not self.viewport.detailed:
+            # Bundled edges are straight lines between the node borders
+            start_x, start_y = self.get_border_point(edge.start, edge.end.x, edge.end.y)
+            end_x, end_y = self.get_border_point(edge.end, edge.start.x, edge.start.y)
+            self.canvas.coords(edge.line_id, *to_screen((start_x, start_y, end_x, end_y)))
+            return
         if edge.start.node_type == "R":
             # For edges starting from a resource, use the dot position
             start_x, start_y = self.get_dot_position(edge.start, edge.dot_index)
             end_x, end_y = self.get_border_point(edge.end, edge.start.x, edge.start.y)
 
-            self.canvas.coords(edge.line_id, start_x, start_y, end_x, end_y)
+            self.canvas.coords(edge.line_id, *to_screen((start_x, start_y, end_x, end_y)))
             self.canvas.itemconfig(edge.line_id, smooth=False)
 
             return
@@ -272,15 +483,13 @@ class DeadlockApp:
             start_x, start_y = self.get_border_point(edge.start, edge.end.x, edge.end.y)
             end_x, end_y = self.get_border_point(edge.end, edge.start.x, edge.start.y)
 
-        # Count existing edges between these nodes
-        existing_edges = [e for e in self.edges if
-                          e.start.node_type == "P" and
-                          (e.start == edge.start and e.end == edge.end)]
+        # Existing edges between these nodes
+        existing_edges = self.parallel_edges[(edge.start, edge.end)]
         edge_count = len(existing_edges)
 
         if edge_count == 1:
             # For single edge, draw a straight line
-            self.canvas.coords(edge.line_id, start_x, start_y, end_x, end_y)
+            self.canvas.coords(edge.line_id, *to_screen((start_x, start_y, end_x, end_y)))
             self.canvas.itemconfig(edge.line_id, smooth=False)
         else:
             # For multiple edges, calculate the curvature
@@ -300,210 +509,211 @@ class DeadlockApp:
             control_y = mid_y + perpendicular_y * curve_factor * length
 
             # Update the edge to be a curved line
-            self.canvas.coords(edge.line_id, start_x, start_y, control_x, control_y, end_x, end_y)
+            self.canvas.coords(edge.line_id, *to_screen((start_x, start_y, control_x, control_y, end_x, end_y)))
             self.canvas.itemconfig(edge.line_id, smooth=True, splinesteps=32)
 
     def on_click(self, event):
-        self.selected_node = self.find_node_at_position(event.x, event.y)
+        self.selected_node = self.find_node_at_position(*self.viewport.to_world(event.x, event.y))
 
     def on_drag(self, event):
         if self.selected_node:
-            dx = event.x - self.selected_node.x
-            dy = event.y - self.selected_node.y
-            self.canvas.move(self.selected_node.id, dx, dy)
-            self.canvas.move(self.selected_node.text_id, dx, dy)
-
-            # Update the node's position
-            self.selected_node.x = event.x
-            self.selected_node.y = event.y
-
-            # Update edge positions if the node is a resource
-            if self.selected_node.node_type == "R":
-                self.update_node_disponibilities(self.selected_node)
-
-            # Redraw edges connected to the moved node
-            for edge in self.edges:
-                if edge.start == self.selected_node or edge.end == self.selected_node:
-                    self.update_edge_position(edge)
-
-    def update_node_disponibilities(self, node):
-        if node.node_type == "R":
-            for dot_id in node.dot_ids:
-                self.canvas.delete(dot_id)
-            node.dot_ids.clear()
-            node.dot_positions.clear()
-            self.draw_disponibilities(node)
-            # Update edge positions
-            for edge in self.edges:
-                if edge.start == node:
-                    self.update_edge_position(edge)
+            # Update the node's position; its shape, dots and edges are redrawn once per frame
+            self.redraw.move_node(self.selected_node, *self.viewport.to_world(event.x, event.y))
+            self.spatial_index.move(self.selected_node)
 
     def find_node_at_position(self, x, y):
-        for node in self.nodes:
-            # Ensures that the user can click anywhere in the circle
-            if (node.x - 25 <= x <= node.x + 25) and (node.y - 25 <= y <= node.y + 25):
-                return node
-        return None
+        # Ensures that the user can click anywhere in the circle
+        return self.spatial_index.find(x, y)
 
     def clear_all(self):
-        # Delete only nodes and edges, not the entire canvas
-        for node in self.nodes:
-            self.canvas.delete(node.id)
-            self.canvas.delete(node.text_id)
-            for dot_id in node.dot_ids:
-                self.canvas.delete(dot_id)
+        if self.task is not None:
+            self.task.cancel()  # A running import stops adding nodes, an analysis result is stale anyway
 
-        for edge in self.edges:
-            self.canvas.delete(edge.line_id)
-
-        self.nodes.clear()
-        self.edges.clear()
+        # Delete only nodes and edges, not the entire canvas
+        for node in list(self.drawn_nodes):
+            for edge in node.incident_edges:
+                self.erase_edge(edge)
+            self.erase_node(node)
+
+        if self.playback is not None:
+            self.root.after_cancel(self.playback[0])
+            self.playback = None
+
+        self.graph.clear()
+        self.parallel_edges.clear()
+        self.last_analysis = None
+        self.spatial_index.clear()
+        self.victims.clear()
+        self.redraw.cancel()
+        self.allocation_index.clear()
+        self.detector.clear()
+        self.update_status(self.detector.status())
         self.p_counter = 0
         self.r_counter = 0
         self.selected_node = None
         self.edge_start = None
 
-    def get_allocated_resources(self, i, j):
-        process_number = i
-        resource_number = j
-        allocated_resources = 0
+    def avoid_deadlock(self):
+        if self.playback is not None or self.task is not None:
+            return  # Still animating the previous result, or busy importing or analyzing
+
+        # The index builds new tables after any change, so these stay an immutable snapshot
+        tables = build_matrices(self.nodes, self.edges, self.allocation_index)
+        wave_mode, verbosity = self.wave_mode.get(), self.verbosity  # Tk variables are read here, not in the worker
+        known = self.known_analysis(tables)
+        self.task = BackgroundTask(
+            self.root, lambda task: analyze_snapshot(tables, wave_mode, verbosity, task, self.analysis_cache, known),
+            on_done=lambda outcome: self.show_analysis(tables, *outcome),
+            on_progress=self.set_progress, on_error=self.task_failed, on_cancel=self.task_cancelled).start()
+
+    def show_analysis(self, tables, result, plan, waves):
+        self.task = None
+        if self.allocation_index.tables is not tables:
+            self.set_progress("Graph changed during the analysis; run it again")
+            return
+        self.set_progress("")
+        self.remember_analysis(tables, result, plan)
+        self.last_result = result
+        self.last_plan = plan
+        self.clear_victims()
+
+        # Each step's edges are collected once, from its processes' own incident edges
+        processes = {node.number: node for node in self.nodes if node.node_type == "P"}
+        steps = deque([edge for process in wave for edge in processes[process].incident_edges] for wave in waves)
+        self.planned_victims = [processes[process] for process in plan.victims] if plan else []
+        self.playback_started = time.perf_counter()
+        self.animate_step(steps)
 
-        for edge in self.edges:
-            # When the edge starts in the Rj and ends in Pi, allocatedResources + 1
-            if (edge.start.node_type == "R" and edge.start.number == resource_number)\
-                and (edge.end.node_type == "P" and edge.end.number == process_number):
-                allocated_resources += 1
+    def remember_analysis(self, tables, result, plan):
+        self.last_analysis = (tables, result, plan)
 
-        return allocated_resources
+    def known_analysis(self, tables):
+        """(result, plan) when the last analysis was of these tables, which the index keeps only
+        while the graph is unchanged."""
+        if self.last_analysis is not None and self.last_analysis[0] is tables:
+            return self.last_analysis[1:]
+        return None
 
-    def get_needed_resources(self, i, j):
-        process_number = i
-        resource_number = j
-        needed_resources = 0
+    def restore_analysis(self, tables, result, plan):
+        """Adopt the analysis saved with a snapshot whose graph was just imported."""
+        self.allocation_index.tables = tables  # build_matrices returns these until the graph changes
+        self.remember_analysis(tables, result, plan)
 
-        for edge in self.edges:
-            # When the edge starts in the Pi and ends in Rj, maxResources + 1
-            if (edge.start.node_type == "P" and edge.start.number == process_number)\
-                and (edge.end.node_type == "R" and edge.end.number == resource_number):
-                needed_resources += 1
+    def cancel_task(self):
+        if self.task is not None:
+            self.task.cancel()  # Its on_cancel clears self.task right away
 
-        return needed_resources
+    def task_cancelled(self):
+        self.task = None
+        self.set_progress("Cancelled")
 
-    def avoid_deadlock(self):
-        resources = 0
-        processes = 0
-        for node in self.nodes:
-            if node.node_type == "R":
-                resources += 1
-            else:
-                processes += 1
-
-        allocated_resources = {f'P{i}': [0] * resources for i in range(processes)}
-        needed_resources = {f'P{i}': [0] * resources for i in range(processes)}
-
-        for i in range(processes):
-            for j in range(resources):
-                allocated_resources[f'P{i}'][j] = self.get_allocated_resources(i, j)
-                needed_resources[f'P{i}'][j] = self.get_needed_resources(i, j)
-
-        print("\nAllocated Resources Table:")
-        for proc, res in allocated_resources.items():
-            print(f"{proc}: {res}")
-        print("\nNeeded Resources Table:")
-        for proc, res in needed_resources.items():
-            print(f"{proc}: {res}")
-
-        total_allocated_resources = [0 for _ in range(resources)]
-        for i in range(processes):
-            for j in range(resources):
-                total_allocated_resources[j] += allocated_resources[f'P{i}'][j]
-        print("\nTotal Allocated Resources: " + str(total_allocated_resources))
-
-        total_available_resources = [0] * resources
-        for node in self.nodes:
-            if node.disponibilities > 0:
-                real_disponibility = node.disponibilities - total_allocated_resources[node.number]
-                total_available_resources[node.number] += real_disponibility
-        print("Total Available Resources: " + str(total_available_resources))
-
-        total_resources = [0] * resources
-        for node in self.nodes:
-            if node.disponibilities > 0:
-                total_resources[node.number] += node.disponibilities
-        print("Total Resources: " + str(total_resources))
-
-        steps = []
-        while allocated_resources:
-            for process in list(allocated_resources.keys()):
-                count = 0
-                new_total_available_resources = total_available_resources.copy()
-                for j in range(resources):
-                    if total_available_resources[j] >= needed_resources[process][j]:
-                        new_total_available_resources[j] += allocated_resources[process][j]
-                        count += 1
-                if count == resources:
-                    total_available_resources = new_total_available_resources
-                    del allocated_resources[process]
-                    del needed_resources[process]
-                    steps.append(int(process[1:]))  # Converts using substring the 'P0', 'P1', etc. to 0, 1, etc.
-                    break
-            else:
-                # If we've gone through all processes without finding a safe one, exit the loop
-                break
+    def task_failed(self, error):
+        self.task = None
+        self.set_progress("")
+        messagebox.showerror("Error", f"{type(error).__name__}: {error}")
 
-        self.animate_step(steps)
+    def set_progress(self, text):
+        self.progress_label.config(text=text)
 
     def animate_step(self, steps):
         if not steps:
-            self.show_result_message()
+            self.finish_animation()
             return
 
-        step = steps.pop(0) # Gets the first element and remove it from the list
-
-        edges_to_remove = []
-        for edge in self.edges:
-            if (edge.start.node_type == 'P' and edge.start.number == step) or (edge.end.node_type == 'P' and edge.end.number == step):
-                edges_to_remove.append(edge)
+        edges_to_remove = steps.popleft()
+        instrumentation.count("animation.steps")
+        instrumentation.observe("animation.edges_per_step", len(edges_to_remove))
 
         for edge in edges_to_remove:
-            self.canvas.itemconfig(edge.line_id, fill='red', width=2)
+            if edge.line_id is not None:
+                self.canvas.itemconfig(edge.line_id, fill='red', width=2)
 
-        self.root.after(2000, self.remove_edges_and_continue, edges_to_remove, steps)
+        after_id = self.root.after(self.playback_delay.get(), self.remove_edges_and_continue, edges_to_remove, steps)
+        self.playback = (after_id, edges_to_remove, steps)
 
     def remove_edges_and_continue(self, edges_to_remove, remaining_steps):
+        self.remove_edges(edges_to_remove)
+        self.animate_step(remaining_steps)
+
+    def skip_animation(self):
+        if self.playback is None:
+            return
+        after_id, edges_to_remove, steps = self.playback
+        self.root.after_cancel(after_id)
+        self.remove_edges(edges_to_remove)
+        instrumentation.count("animation.skipped_steps", len(steps))
+        while steps:
+            self.remove_edges(steps.popleft())
+        self.finish_animation()
+
+    def finish_animation(self):
+        self.playback = None
+        instrumentation.add_time("animation", time.perf_counter() - self.playback_started)
+        self.show_result_message()
+
+    def remove_edges(self, edges_to_remove):
         for edge in edges_to_remove:
-            self.canvas.delete(edge.line_id)
+            if edge not in self.edges:
+                continue  # Already removed with its node while the animation was running
+            self.erase_edge(edge)
             self.edges.remove(edge)
-
-        self.animate_step(remaining_steps)
+            self.ungroup_edge(edge)
+            self.redraw.forget_edge(edge)
+            self.allocation_index.remove_edge(edge)
+            self.update_status(self.detector.remove_edge(edge))
+
+    def show_victims(self, nodes):
+        self.victims.update(nodes)
+        for node in nodes:
+            if node.id is not None:
+                self.canvas.itemconfig(node.id, fill="orange")
+
+    def clear_victims(self):
+        for node in self.victims:
+            if node.id is not None:
+                self.canvas.itemconfig(node.id, fill="white")
+        self.victims.clear()
+
+    def update_status(self, state):
+        self.status_label.config(text=f"Status: {state}")
 
     def show_result_message(self):
         if any(self.edges):
-            messagebox.showinfo("DEADLOCK!!!", "Deadlock could not be avoided.")
+            message = "Deadlock could not be avoided."
+            if self.last_result is not None and self.last_result.cycles:
+                cycles = "\n".join(", ".join(f"P{process}" for process in cycle) for cycle in self.last_result.cycles)
+                message += f"\n\nProcesses in each deadlock cycle:\n{cycles}"
+            if self.planned_victims:
+                self.show_victims(self.planned_victims)
+                victims = ", ".join(f"P{node.number}" for node in self.planned_victims)
+                message += f"\n\nPreempting {victims} (highlighted) lets every other process finish."
+                if not self.last_plan.optimal:
+                    message += "\nThis is the cheapest choice found before the search limit; a cheaper one may exist."
+            messagebox.showinfo("DEADLOCK!!!", message)
         else:
             messagebox.showinfo("Resolution Complete", "Deadlock successfully avoided!")
 
-class Node:
-    def __init__(self, id, text_id, node_type, number, x, y, disponibilities=0):
-        self.id = id
-        self.text_id = text_id
-        self.node_type = node_type
-        self.number = number
-        self.x = x
-        self.y = y
-        self.disponibilities = disponibilities
-        self.dot_ids = []
-
-
-class Edge:
-    def __init__(self, start, end, dot_index=None):
-        self.start = start
-        self.end = end
-        self.dot_index = dot_index  # Store which dot the edge starts from (if applicable)
-        self.line_id = None
-
 
 if __name__ == "__main__": # Only runs the app when the user runs this class
+    parser = argparse.ArgumentParser(description="Deadlock Analyzer")
+    parser.add_argument("--verbosity", type=int, choices=(0, 1, 2), default=1,
+                        help="console output of Avoid Deadlock: 0 none, 1 a summary, 2 the full tables")
+    parser.add_argument("--stats", help="write phase timings and counters to this JSON file on exit")
+    parser.add_argument("--log", help="write every timed phase as a JSON Lines event to this file")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="keep Avoid Deadlock results in this directory across sessions (default: in memory)")
+    args = parser.parse_args()
+    if args.stats:
+        instrumentation.enable()
+    log_file = open(args.log, 'w') if args.log else None
+    if log_file:
+        instrumentation.add_hook(JsonLinesHook(log_file))
+
     root = tk.Tk() # Creates the Tkinter's GUI (window)
-    app = DeadlockApp(root)
-    root.mainloop() # Start event loop (event listening)
\ No newline at end of file
+    app = DeadlockApp(root, args.verbosity, args.cache)
+    root.mainloop() # Start event loop (event listening)
+
+    if args.stats:
+        instrumentation.dump(args.stats)
+    if log_file:
+        log_file.close()
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""Counting, listing and optimizing all the safe sequences of a system.
+
+find_safe_sequence stops at the first order that works. Here the search runs over the set of
+finished processes instead of over orders: Available only depends on which processes have
+finished, not on the order they finished in, so every state is a bitmask, each one is solved
+once, and the orders that share a finished set share its result.
+
+Processes that hold nothing give nothing back when they finish, so for counting they are
+interchangeable once they can run: the count only tracks how many of them already ran, and
+the bitmasks cover the processes that hold resources. The number of reachable sets can
+still grow as 2^n when almost every process can run at any time, so this is meant for
+dozens of processes, not thousands.
+
+Usage: python SafeSequences.py scenarios/activities_scenario.json --list 5 --earliest 2
+"""
+import argparse
+
+from Bankers import as_vector
+from DeadlockEngine import ResourceTables, find_safe_sequence, load_tables
+
+
+class SafeSequenceSearch:
+    def __init__(self, tables):
+        self.tables = tables
+        self.full = (1 << tables.processes) - 1
+        self.safe = find_safe_sequence(tables).safe  # Unsafe systems have no sequence to search for
+        self.idle = [process for process in range(tables.processes) if not any(tables.allocated[process])]
+        self.holders = self.full  # Bitmask of the processes that hold something
+        for process in self.idle:
+            self.holders &= ~(1 << process)
+        self.counts = {}  # (finished holders, idle processes run) -> ways to finish the other processes
+
+    def runnable(self, finished, work):
+        for process in range(self.tables.processes):
+            if not finished >> process & 1 and self.fits(process, work):
+                yield process
+
+    def release(self, work, process):
+        return [available + held for available, held in zip(work, self.tables.allocated[process])]
+
+    def fits(self, process, work):
+        return all(work[j] >= amount for j, amount in enumerate(self.tables.needed[process]))
+
+    def count(self):
+        """Number of distinct safe sequences (0 when the system is unsafe)."""
+        if not self.safe:
+            return 0
+        return self._count(0, 0, list(self.tables.available))
+
+    def _count(self, finished, idle_run, work):
+        """Ways to finish everything from here; finished only holds processes that hold something."""
+        if finished == self.holders and idle_run == len(self.idle):
+            return 1
+        total = self.counts.get((finished, idle_run))
+        if total is None:
+            total = 0
+            ready_idle = sum(1 for process in self.idle if self.fits(process, work)) - idle_run
+            if ready_idle > 0:
+                # Any of the idle processes that can run may go next; which one doesn't change the rest
+                total += ready_idle * self._count(finished, idle_run + 1, work)
+            for process in self.runnable(finished | ~self.holders & self.full, work):
+                total += self._count(finished | 1 << process, idle_run, self.release(work, process))
+            self.counts[(finished, idle_run)] = total
+        return total
+
+    def completes(self, finished, work):
+        """Whether the processes outside finished can all still run to completion.
+
+        Idle processes never block the others and can run once the holders are done, so only
+        the holders in finished matter.
+        """
+        return self._count(finished & self.holders, 0, work) > 0
+
+    def sequences(self, limit=None):
+        """Yield safe sequences in lexicographic order of process numbers, at most limit of them.
+
+        Finished sets that lead nowhere are known from the counts, so no dead end is explored.
+        """
+        if not self.safe or limit == 0:
+            return
+        produced = 0
+        # Depth-first: (sequence so far, finished set, work, runnable processes still to try)
+        work = list(self.tables.available)
+        stack = [([], 0, work, iter(list(self.runnable(0, work))))]
+        while stack:
+            sequence, finished, work, choices = stack[-1]
+            if finished == self.full:
+                stack.pop()
+                yield sequence
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+                continue
+            process = next(choices, None)
+            if process is None:
+                stack.pop()
+                continue
+            child, child_work = finished | 1 << process, self.release(work, process)
+            if self.completes(child, child_work):
+                stack.append((sequence + [process], child, child_work,
+                              iter(list(self.runnable(child, child_work)))))
+
+    def best(self, cost):
+        """The safe sequence with the lowest total cost(process, position), and that total.
+
+        position counts from 0. Returns (None, None) when the system is unsafe. The cost tells
+        idle processes apart, so this searches the finished sets of every process and is the
+        most expensive query here.
+        """
+        if not self.safe:
+            return None, None
+        memo = {}
+
+        def solve(finished, work, position):
+            # Lowest cost of finishing the remaining processes, and the process to run first
+            if finished == self.full:
+                return 0, None
+            if finished not in memo:
+                best_value, best_process = None, None
+                for process in self.runnable(finished, work):
+                    child = finished | 1 << process
+                    child_work = self.release(work, process)
+                    if not self.completes(child, child_work):
+                        continue
+                    value = cost(process, position) + solve(child, child_work, position + 1)[0]
+                    if best_value is None or value < best_value:
+                        best_value, best_process = value, process
+                memo[finished] = (best_value, best_process)
+            return memo[finished]
+
+        total, _ = solve(0, list(self.tables.available), 0)
+        sequence, finished = [], 0
+        while finished != self.full:
+            process = memo[finished][1]
+            sequence.append(process)
+            finished |= 1 << process
+        return sequence, total
+
+    def earliest(self, target):
+        """A safe sequence that runs target as early as possible."""
+        sequence, _ = self.best(lambda process, position: position if process == target else 0)
+        return sequence
+
+
+def tables_from_bankers(state, resource_amount):
+    """ResourceTables for a Bankers.py state; process numbers are indices into state."""
+    total = as_vector(resource_amount)
+    allocated = [as_vector(info.has) for info in state]
+    needed = [[maximum - held for maximum, held in zip(as_vector(info.max), holding)]
+              for info, holding in zip(state, allocated)]
+    available = list(total)
+    for holding in allocated:
+        available = [amount - held for amount, held in zip(available, holding)]
+    return ResourceTables(allocated, needed, available, total)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count and list the safe sequences of a scenario.")
+    parser.add_argument("scenario", help=".json, .jsonl or .dlkb scenario file")
+    parser.add_argument("--list", type=int, default=0, metavar="N", help="print the first N safe sequences")
+    parser.add_argument("--earliest", type=int, metavar="P", help="print a safe sequence that runs process P as early as possible")
+    args = parser.parse_args(argv)
+
+    search = SafeSequenceSearch(load_tables(args.scenario))
+    print(f"Safe sequences: {search.count()}")
+    for sequence in search.sequences(args.list):
+        print(" ".join(f"P{process}" for process in sequence))
+    if args.earliest is not None and search.safe:
+        print(f"Earliest P{args.earliest}: " + " ".join(f"P{process}" for process in search.earliest(args.earliest)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Saving the GUI's graph: scenario export and session snapshots.
+
+Exports use the scenarios/*.json schema (or .jsonl/.dlkb, by extension), so they can be
+imported again or analyzed headlessly. A snapshot (.dlsnap) is a JSON file holding the same
+graph plus the analysis of that graph:
+
+    {"format": "deadlock-snapshot", "version": 1,
+     "hash": sha256 of the graph in canonical JSON,
+     "graph": {"nodes": [...], "edges": [...]},
+     "analysis": {"tables": {"allocated": [[process, resource, units], ...], "needed": [...],
+                             "available": [...], "total": [...]},
+                  "result": {"safe_sequence": [...], "deadlocked": [...], "waves": ..., "cycles": ...},
+                  "plan": {"victims": [...], "cost": ..., "optimal": ..., "safe_sequence": [...]} or null}}
+
+When a snapshot is reopened and its graph still hashes to the stored hash, the stored
+analysis is used as is; a graph edited by hand is analyzed again.
+"""
+import hashlib
+import json
+import os
+
+from BackgroundTask import BackgroundTask
+from BinaryScenario import export_records
+from DeadlockEngine import AnalysisResult, ResourceTables, build_matrices, detect, tables_from_records
+from RecoveryPlanner import RecoveryPlan, plan_recovery
+from ScenarioStream import iter_scenario_records, write_jsonl
+
+SNAPSHOT_FORMAT = "deadlock-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def graph_data(nodes, edges):
+    """The graph as a scenario dictionary ({"nodes": [...], "edges": [...]})."""
+    node_records = []
+    for node in nodes:
+        record = {"type": node.node_type, "number": node.number}
+        if node.node_type == "R":
+            record["disponibilities"] = node.disponibilities
+        record["x"] = _coordinate(node.x)
+        record["y"] = _coordinate(node.y)
+        node_records.append(record)
+    edge_records = [{"start_node": {"type": edge.start.node_type, "number": edge.start.number},
+                     "end_node": {"type": edge.end.node_type, "number": edge.end.number}}
+                    for edge in edges]
+    return {"nodes": node_records, "edges": edge_records}
+
+
+def _coordinate(value):
+    return int(value) if float(value).is_integer() else value
+
+
+def content_hash(graph):
+    """sha256 of a scenario dictionary, independent of key order and whitespace."""
+    canonical = json.dumps(graph, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _sparse(matrix):
+    return [[i, j, amount] for i, row in enumerate(matrix) for j, amount in enumerate(row) if amount]
+
+
+def _dense(entries, processes, resources):
+    matrix = [[0] * resources for _ in range(processes)]
+    for i, j, amount in entries:
+        matrix[i][j] = amount
+    return matrix
+
+
+def analyze_tables(tables):
+    """The analysis a snapshot stores: the safety result and, when unsafe, the recovery plan."""
+    result = detect(tables)
+    return result, None if result.safe else plan_recovery(tables)
+
+
+def write_scenario(graph, file_path):
+    """Save a scenario as .json, .jsonl or .dlkb, chosen by the file extension."""
+    if file_path.endswith('.jsonl'):
+        write_jsonl(graph, file_path)
+    elif file_path.endswith('.dlkb'):
+        export_records(iter_scenario_records(graph), file_path)
+    else:
+        with open(file_path, 'w') as file:
+            json.dump(graph, file)
+
+
+def write_snapshot(file_path, graph, tables=None, result=None, plan=None):
+    """Write a snapshot of graph (a scenario dictionary) with its analysis.
+
+    tables, result and plan are computed when not given. Returns (tables, result, plan).
+    """
+    if tables is None:
+        tables = tables_from_records(iter_scenario_records(graph))
+    if result is None:
+        result, plan = analyze_tables(tables)
+    analysis = {
+        "tables": {"allocated": _sparse(tables.allocated), "needed": _sparse(tables.needed),
+                   "available": list(tables.available), "total": list(tables.total)},
+        "result": {"safe_sequence": list(result.safe_sequence), "deadlocked": list(result.deadlocked),
+                   "waves": result.waves, "cycles": result.cycles},
+        "plan": plan.to_dict() if plan is not None else None,
+    }
+    with open(file_path, 'w') as file:
+        json.dump({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "hash": content_hash(graph),
+                   "graph": graph, "analysis": analysis}, file)
+    return tables, result, plan
+
+
+class Snapshot:
+    def __init__(self, graph, tables=None, result=None, plan=None):
+        self.graph = graph  # Scenario dictionary
+        self.tables = tables  # Stored analysis, None when the graph changed since it was saved
+        self.result = result
+        self.plan = plan
+
+    @property
+    def fresh(self):
+        """True when the stored analysis belongs to the graph."""
+        return self.result is not None
+
+    def analyze(self):
+        """(tables, result, plan), from the snapshot when fresh, recomputed otherwise."""
+        if not self.fresh:
+            self.tables = tables_from_records(iter_scenario_records(self.graph))
+            self.result, self.plan = analyze_tables(self.tables)
+        return self.tables, self.result, self.plan
+
+
+def load_snapshot(file_path):
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+    if data.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{file_path} is not a deadlock snapshot")
+    if data.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"{file_path}: unsupported snapshot version {data.get('version')}")
+
+    graph = data["graph"]
+    analysis = data.get("analysis")
+    if analysis is None or data.get("hash") != content_hash(graph):
+        return Snapshot(graph)
+
+    stored = analysis["tables"]
+    processes = sum(1 for node in graph["nodes"] if node["type"] == "P")
+    resources = len(stored["total"])
+    tables = ResourceTables(_dense(stored["allocated"], processes, resources),
+                            _dense(stored["needed"], processes, resources),
+                            stored["available"], stored["total"])
+    result = analysis["result"]
+    result = AnalysisResult(result["safe_sequence"], result["deadlocked"], result["waves"], result["cycles"])
+    plan = analysis["plan"]
+    if plan is not None:
+        plan = RecoveryPlan(plan["victims"], plan["cost"], plan["optimal"], plan["safe_sequence"])
+    return Snapshot(graph, tables, result, plan)
+
+
+class ScenarioExporter:
+    def __init__(self, app):
+        self.app = app
+
+    def export_graph(self):
+        from tkinter import filedialog  # Imported here so the headless functions above never need Tk
+
+        file_path = filedialog.asksaveasfilename(
+            title="Export Graph",
+            initialdir=os.getcwd() + "/scenarios",
+            defaultextension=".json",
+            filetypes=(("JSON Files", "*.json"), ("JSON Lines Files", "*.jsonl"), ("Binary Scenarios", "*.dlkb"))
+        )
+        if not file_path:
+            return  # User canceled file selection
+        write_scenario(graph_data(self.app.nodes, self.app.edges), file_path)
+
+    def save_snapshot(self):
+        if self.app.task is not None:
+            return  # Busy importing or analyzing
+
+        from tkinter import filedialog
+        file_path = filedialog.asksaveasfilename(
+            title="Save Snapshot",
+            initialdir=os.getcwd(),
+            defaultextension=".dlsnap",
+            filetypes=(("Deadlock Snapshots", "*.dlsnap"),)
+        )
+        if not file_path:
+            return
+
+        # The graph is copied here, on the Tk thread; analyzing (when needed) and writing run
+        # on the worker
+        graph = graph_data(self.app.nodes, self.app.edges)
+        tables = build_matrices(self.app.nodes, self.app.edges, self.app.allocation_index)
+        result, plan = self.app.known_analysis(tables) or (None, None)
+        self.app.set_progress("Saving snapshot...")
+        self.app.task = BackgroundTask(
+            self.app.root, lambda task: write_snapshot(file_path, graph, tables, result, plan),
+            on_done=self.snapshot_saved, on_error=self.app.task_failed, on_cancel=self.app.task_cancelled).start()
+
+    def snapshot_saved(self, analysis):
+        self.app.task = None
+        self.app.set_progress("")
+        self.app.remember_analysis(*analysis)
@@ -0,0 +1,115 @@
+"""Synthetic resource-allocation graphs in the scenarios/ format.
+
+Generated graphs are safe by construction (requests are sized along a hidden finishing
+order) unless a deadlock is planted: a ring of processes that each hold a unit of one
+resource while asking for every instance of the next one. The adversarial variant chains
+the processes in reverse number order, which makes the reference safety loop (restarting
+from the first process after every grant) do quadratic work.
+
+Usage: python ScenarioGenerator.py -p 200 -r 40 -i 3 -d 0.1 --deadlock -o scenarios/generated.json
+"""
+import argparse
+import random
+
+from ScenarioExporter import write_scenario
+
+
+def generate_scenario(processes, resources, instances=3, density=0.1, deadlock=False, adversarial=False,
+                      allocation_ratio=0.7, seed=None):
+    """Return a scenario dictionary.
+
+    instances is the disponibilities of each resource, or a (low, high) range to draw them
+    from. density is the chance that a process requests a given resource. A planted deadlock
+    needs at least 2 processes and 2 resources; the adversarial chain uses R0.
+    """
+    rng = random.Random(seed)
+    if isinstance(instances, int):
+        instances = (instances, instances)
+    capacities = [rng.randint(*instances) for _ in range(resources)]
+    if adversarial and resources:
+        capacities[0] = max(capacities[0], processes)
+
+    allocated = [dict() for _ in range(processes)]
+    needed = [dict() for _ in range(processes)]
+    available = list(capacities)
+
+    # The planted ring: Pk holds one unit of Rk and asks for every instance of R(k+1)
+    ring = []
+    if deadlock:
+        if processes < 2 or resources < 2:
+            raise ValueError("A planted deadlock needs at least 2 processes and 2 resources")
+        size = min(processes, resources, rng.randint(2, 4))
+        ring = rng.sample(range(processes), size)
+        ring_resources = rng.sample(range(resources), size)
+        for k, process in enumerate(ring):
+            resource = ring_resources[k]
+            allocated[process][resource] = 1
+            available[resource] -= 1
+            next_resource = ring_resources[(k + 1) % size]
+            needed[process][next_resource] = capacities[next_resource]
+
+    others = [process for process in range(processes) if process not in ring]
+    if adversarial and resources:
+        others.sort()
+        for process in others:
+            if available[0] > 0:
+                allocated[process][0] = allocated[process].get(0, 0) + 1
+                available[0] -= 1
+    for resource in range(resources):
+        share = int(capacities[resource] * allocation_ratio)
+        for _ in range(share):
+            if available[resource] <= 0 or not processes:
+                break
+            process = rng.randrange(processes)
+            if process in ring:
+                continue  # Keep the ring's holdings minimal so only the ring is stuck
+            allocated[process][resource] = allocated[process].get(resource, 0) + 1
+            available[resource] -= 1
+
+    # Size the other requests along a finishing order, so those processes can always finish
+    order = sorted(others, reverse=True) if adversarial else rng.sample(others, len(others))
+    work = list(available)
+    for process in order:
+        for resource in range(resources):
+            if adversarial and resource == 0:
+                needed[process][0] = work[0]  # Runnable exactly at its turn and not earlier
+            elif work[resource] > 0 and rng.random() < density:
+                needed[process][resource] = rng.randint(1, work[resource])
+        for resource, amount in allocated[process].items():
+            work[resource] += amount
+
+    nodes = [{"type": "P", "number": i, "x": rng.randint(50, 750), "y": rng.randint(50, 550)}
+             for i in range(processes)]
+    nodes += [{"type": "R", "number": j, "disponibilities": capacities[j],
+               "x": rng.randint(50, 750), "y": rng.randint(50, 550)} for j in range(resources)]
+    edges = []
+    for process in range(processes):
+        for resource, amount in allocated[process].items():
+            edges += [{"start_node": {"type": "R", "number": resource},
+                       "end_node": {"type": "P", "number": process}}] * amount
+        for resource, amount in needed[process].items():
+            edges += [{"start_node": {"type": "P", "number": process},
+                       "end_node": {"type": "R", "number": resource}}] * amount
+    rng.shuffle(edges)
+    return {"nodes": nodes, "edges": edges}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a random resource-allocation scenario.")
+    parser.add_argument("-p", "--processes", type=int, required=True)
+    parser.add_argument("-r", "--resources", type=int, required=True)
+    parser.add_argument("-i", "--instances", type=int, default=3, help="disponibilities per resource")
+    parser.add_argument("-d", "--density", type=float, default=0.1, help="chance of a request per (P, R) pair")
+    parser.add_argument("--deadlock", action="store_true", help="plant a deadlock cycle")
+    parser.add_argument("--adversarial", action="store_true", help="worst-case ordering for the safety loop")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("-o", "--output", required=True, help=".json, .jsonl or .dlkb file")
+    args = parser.parse_args(argv)
+
+    graph_data = generate_scenario(args.processes, args.resources, args.instances, args.density,
+                                   args.deadlock, args.adversarial, seed=args.seed)
+    write_scenario(graph_data, args.output)
+
+
+if __name__ == "__main__":
+    main()
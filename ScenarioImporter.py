@@ -1,7 +1,14 @@
 import os
-import json
+import time
 from tkinter import filedialog
 
+from BackgroundTask import BackgroundTask
+from Instrumentation import instrumentation
+from ScenarioExporter import load_snapshot
+from ScenarioStream import iter_records, iter_scenario_records, is_edge_record, node_key
+
+CHUNK_SIZE = 500  # Records added to the graph per Tk tick, so the window keeps redrawing during an import
+
 
 class ScenarioImporter:
     def __init__(self, app):
@@ -15,41 +22,92 @@ class ScenarioImporter:
         file_path = filedialog.askopenfilename(
             title="Select Graph File",
             initialdir=project_directory + "/scenarios",  # Set the initial directory to the project directory
-            filetypes=(("JSON Files", "*.json"), ("All Files", "*.*"))
+            filetypes=(("JSON Files", "*.json"), ("JSON Lines Files", "*.jsonl"), ("Binary Scenarios", "*.dlkb"),
+                       ("Deadlock Snapshots", "*.dlsnap"), ("All Files", "*.*"))
         )
         if not file_path:
             return  # User canceled file selection
 
-        with open(file_path, 'r') as file:
-            graph_data = json.load(file)
+        if self.app.task is not None:
+            return  # Busy importing or analyzing
 
         # Clear the current graph and canvas before importing
         self.app.clear_all()
 
-        # Add processes and resources (including disponibilities for resources)
-        for node_data in graph_data['nodes']:
-            x = node_data.get('x', 0)  # Default to 0 if not provided
-            y = node_data.get('y', 0)  # Default to 0 if not provided
-
-            if node_data['type'] == 'P':
-                self.app.p_counter = node_data['number']
-                self.app.add_process(x, y)  # Adjust this method to accept x, y
-            elif node_data['type'] == 'R':
-                self.app.r_counter = node_data['number']
-                self.app.add_resource_with_disponibilities(node_data['disponibilities'], x,
-                                                                           y)  # Adjust this method to accept x, y
-
-        # Add edges
-        for edge_data in graph_data['edges']:
-            # Accessing start_node and end_node correctly as dictionaries
-            start_type = edge_data['start_node']['type']
-            start_number = edge_data['start_node']['number']
-            end_type = edge_data['end_node']['type']
-            end_number = edge_data['end_node']['number']
-
-            # Find the corresponding nodes by their type and number
-            start_node = next(
-                node for node in self.app.nodes if node.node_type == start_type and node.number == start_number)
-            end_node = next(node for node in self.app.nodes if node.node_type == end_type and node.number == end_number)
+        # Parsing runs on a worker thread that sends the records in chunks; each chunk is added
+        # to the graph on its own Tk tick, since nodes and edges can only be created there
+        started = time.perf_counter()
+        nodes_by_key = {}
+        self.app.task = BackgroundTask(
+            self.app.root, lambda task: read_records(file_path, task),
+            on_item=lambda records: self.add_records(records, nodes_by_key),
+            on_done=lambda snapshot: self.finish_import(snapshot, file_path, started),
+            on_error=self.import_failed, on_cancel=self.import_cancelled, max_pending=4).start()
+
+    def add_records(self, records, nodes_by_key):
+        # A malformed record raises here and BackgroundTask ends the import through import_failed
+        for record in records:
+            self.add_record(record, nodes_by_key)
+        self.app.set_progress(f"Importing: {len(nodes_by_key)} nodes")
+
+    def finish_import(self, snapshot, file_path, started):
+        if snapshot is not None and snapshot.fresh:
+            # The graph is exactly the one the snapshot analyzed: no need to analyze it again
+            self.app.restore_analysis(snapshot.tables, snapshot.result, snapshot.plan)
+        self.app.task = None
+        self.app.set_progress("")
+        instrumentation.add_time("import", time.perf_counter() - started, file=file_path)
+        instrumentation.count("import.nodes", len(self.app.nodes))
+        instrumentation.count("import.edges", len(self.app.edges))
+
+    def import_cancelled(self):
+        self.app.clear_all()  # Never leave a half-imported graph behind
+        self.app.task_cancelled()
+
+    def import_failed(self, error):
+        self.app.task.cancel()  # Stops the worker and drops the part already added
+        self.app.task_failed(error)
 
+    def add_record(self, record, nodes_by_key):
+        # Edges find their nodes by (type, number)
+        if is_edge_record(record):
+            start_node = nodes_by_key[node_key(record['start_node'])]
+            end_node = nodes_by_key[node_key(record['end_node'])]
             self.app.add_edge(start_node, end_node)
+            return
+
+        x = record.get('x', 0)  # Default to 0 if not provided
+        y = record.get('y', 0)  # Default to 0 if not provided
+
+        # Add processes and resources (including disponibilities for resources)
+        if record['type'] == 'P':
+            self.app.p_counter = record['number']
+            node = self.app.add_process(x, y)
+        elif record['type'] == 'R':
+            self.app.r_counter = record['number']
+            node = self.app.add_resource_with_disponibilities(record['disponibilities'], x, y)
+        else:
+            return
+        nodes_by_key[node_key(record)] = node
+
+
+def read_records(file_path, task):
+    """Parse a scenario file on a BackgroundTask thread, sending its records CHUNK_SIZE at a time.
+
+    Returns the Snapshot of a .dlsnap file, None for the other formats.
+    """
+    snapshot = None
+    if file_path.endswith('.dlsnap'):
+        snapshot = load_snapshot(file_path)
+        records = iter_scenario_records(snapshot.graph)
+    else:
+        records = iter_records(file_path)
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == CHUNK_SIZE:
+            task.send(chunk)
+            chunk = []
+    if chunk:
+        task.send(chunk)
+    return snapshot
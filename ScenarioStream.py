@@ -0,0 +1,60 @@
+"""Incremental reading of scenario files.
+
+Besides the scenarios/*.json format, scenarios can be stored as JSON Lines (.jsonl): one
+JSON object per line, either a node ({"type": "P", "number": 0, "x": 150, "y": 150}) or an
+edge ({"start_node": {...}, "end_node": {...}}), with every node listed before the edges
+that use it. JSON Lines files are read one line at a time, so memory does not grow with the
+number of edges.
+"""
+import json
+
+
+def is_edge_record(record):
+    return 'start_node' in record
+
+
+def iter_json_records(file_path):
+    # The standard json module can't parse incrementally, so .json files are loaded whole
+    with open(file_path, 'r') as file:
+        graph_data = json.load(file)
+    return iter_scenario_records(graph_data)
+
+
+def iter_scenario_records(graph_data):
+    for node_data in graph_data['nodes']:
+        yield node_data
+    for edge_data in graph_data['edges']:
+        yield edge_data
+
+
+def iter_jsonl_records(file_path):
+    with open(file_path, 'r') as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"{file_path}:{line_number}: invalid JSON ({error.msg})") from None
+
+
+def iter_records(file_path):
+    """Yield the node and edge records of a scenario file in file order."""
+    if file_path.endswith('.jsonl'):
+        return iter_jsonl_records(file_path)
+    if file_path.endswith('.dlkb'):
+        from BinaryScenario import iter_binary_records  # Imported here: BinaryScenario imports this module
+        return iter_binary_records(file_path)
+    return iter_json_records(file_path)
+
+
+def node_key(node_data):
+    return node_data['type'], node_data['number']
+
+
+def write_jsonl(graph_data, file_path):
+    """Convert a scenario dictionary to the JSON Lines format."""
+    with open(file_path, 'w') as file:
+        for record in iter_scenario_records(graph_data):
+            file.write(json.dumps(record) + "\n")
@@ -0,0 +1,84 @@
+import math
+
+
+class SpatialIndex:
+    """Uniform grid over node positions, so a click only looks at the nodes near it.
+
+    Each node is stored in every cell its 50x50 hit box overlaps. When hit boxes overlap, the
+    node added first wins, like the linear scan over DeadlockApp.nodes did.
+    """
+
+    def __init__(self, cell_size=50, half_size=25):
+        self.cell_size = cell_size
+        self.half_size = half_size  # Half the width/height of a node's hit box
+        self.cells = {}  # (column, row) -> nodes whose hit box overlaps the cell
+        self.node_cells = {}  # node -> cells it is stored in
+        self.order = {}  # node -> insertion number
+        self.counter = 0
+
+    def insert(self, node):
+        self.order[node] = self.counter
+        self.counter += 1
+        self._store(node)
+
+    def remove(self, node):
+        self._unstore(node)
+        del self.order[node]
+
+    def move(self, node):
+        """Re-file a node after its x/y changed."""
+        self._unstore(node)
+        self._store(node)
+
+    def clear(self):
+        self.cells.clear()
+        self.node_cells.clear()
+        self.order.clear()
+
+    def find(self, x, y):
+        best = None
+        for node in self.cells.get(self._cell(x, y), ()):
+            if (node.x - self.half_size <= x <= node.x + self.half_size) and \
+                    (node.y - self.half_size <= y <= node.y + self.half_size):
+                if best is None or self.order[node] < self.order[best]:
+                    best = node
+        return best
+
+    def query(self, left, top, right, bottom):
+        """Nodes whose hit box overlaps the rectangle, in the order they were added."""
+        first_column, first_row = self._cell(left, top)
+        last_column, last_row = self._cell(right, bottom)
+        if (last_column - first_column + 1) * (last_row - first_row + 1) > len(self.cells):
+            # Zoomed far out: cheaper to walk the occupied cells than the empty ones
+            cells = [nodes for (column, row), nodes in self.cells.items()
+                     if first_column <= column <= last_column and first_row <= row <= last_row]
+        else:
+            cells = [self.cells[(column, row)] for column in range(first_column, last_column + 1)
+                     for row in range(first_row, last_row + 1) if (column, row) in self.cells]
+
+        found = set()
+        for nodes in cells:
+            for node in nodes:
+                if node.x + self.half_size >= left and node.x - self.half_size <= right and \
+                        node.y + self.half_size >= top and node.y - self.half_size <= bottom:
+                    found.add(node)
+        return sorted(found, key=self.order.__getitem__)
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _store(self, node):
+        first_column, first_row = self._cell(node.x - self.half_size, node.y - self.half_size)
+        last_column, last_row = self._cell(node.x + self.half_size, node.y + self.half_size)
+        cells = [(column, row) for column in range(first_column, last_column + 1)
+                 for row in range(first_row, last_row + 1)]
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(node)
+        self.node_cells[node] = cells
+
+    def _unstore(self, node):
+        for cell in self.node_cells.pop(node):
+            nodes = self.cells[cell]
+            nodes.remove(node)
+            if not nodes:
+                del self.cells[cell]
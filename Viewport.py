@@ -0,0 +1,57 @@
+import math
+
+DETAIL_ZOOM = 0.6  # Below this zoom labels, dots and curves are dropped and parallel edges bundled
+MIN_ZOOM = 0.02
+MAX_ZOOM = 4.0
+
+
+class Viewport:
+    """The part of the graph shown on the canvas: a scroll offset and a zoom factor.
+
+    Node positions are kept in graph coordinates; the canvas only holds items for what lies
+    inside the viewport, placed at screen coordinates.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.left = 0.0  # Graph coordinates of the top-left corner of the canvas
+        self.top = 0.0
+        self.zoom = 1.0
+
+    @property
+    def detailed(self):
+        return self.zoom >= DETAIL_ZOOM
+
+    def to_screen(self, x, y):
+        return (x - self.left) * self.zoom, (y - self.top) * self.zoom
+
+    def to_world(self, x, y):
+        return x / self.zoom + self.left, y / self.zoom + self.top
+
+    def points_to_screen(self, points):
+        """Convert a flat x0, y0, x1, y1, ... sequence."""
+        return [(value - (self.left if i % 2 == 0 else self.top)) * self.zoom for i, value in enumerate(points)]
+
+    def bounds(self):
+        """(left, top, right, bottom) of the visible area in graph coordinates."""
+        return self.left, self.top, self.left + self.width / self.zoom, self.top + self.height / self.zoom
+
+    def contains(self, node, half_size=25):
+        left, top, right, bottom = self.bounds()
+        return left - half_size <= node.x <= right + half_size and top - half_size <= node.y <= bottom + half_size
+
+    def scroll(self, dx, dy):
+        """Move the view by a distance in screen pixels."""
+        self.left += dx / self.zoom
+        self.top += dy / self.zoom
+
+    def zoom_at(self, factor, x, y):
+        """Zoom by factor around the screen point (x, y), which stays over the same graph point."""
+        world_x, world_y = self.to_world(x, y)
+        self.zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+        self.left = world_x - x / self.zoom
+        self.top = world_y - y / self.zoom
+
+    def bundle_width(self, count):
+        return min(1 + math.log2(count), 6)
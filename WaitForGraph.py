@@ -0,0 +1,130 @@
+"""Deadlock detection on the process wait-for graph.
+
+When every resource has a single instance, a process waiting for a resource simply waits
+for the process holding it. Collapsing the P -> R -> P edges gives a graph between processes
+whose cycles (strongly connected components) are exactly the deadlocks, found with Tarjan's
+algorithm in O(V + E).
+"""
+import heapq
+
+
+def build_wait_for_graph(tables):
+    """Successor lists: Pi -> Pk when Pi requests a resource Pk holds."""
+    holders = [[] for _ in range(tables.resources)]
+    for process, row in enumerate(tables.allocated):
+        for resource, amount in enumerate(row):
+            if amount:
+                holders[resource].append(process)
+
+    graph = [[] for _ in range(tables.processes)]
+    impossible = [False] * tables.processes  # Requests that more than every instance can satisfy
+    for process, row in enumerate(tables.needed):
+        for resource, amount in enumerate(row):
+            if amount > tables.total[resource]:
+                impossible[process] = True
+            elif amount > tables.available[resource]:
+                graph[process].extend(holders[resource])
+    return graph, impossible
+
+
+def strongly_connected_components(graph):
+    """Tarjan's algorithm, iterative so deep graphs don't hit the recursion limit.
+
+    Components come out in reverse topological order: a component is listed only after every
+    component it can reach.
+    """
+    index = [None] * len(graph)
+    low = [0] * len(graph)
+    on_stack = [False] * len(graph)
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(len(graph)):
+        if index[root] is not None:
+            continue
+        work = [(root, 0)]
+        while work:
+            vertex, i = work[-1]
+            if i == 0:
+                index[vertex] = low[vertex] = counter
+                counter += 1
+                stack.append(vertex)
+                on_stack[vertex] = True
+
+            successors = graph[vertex]
+            if i < len(successors):
+                work[-1] = (vertex, i + 1)
+                successor = successors[i]
+                if index[successor] is None:
+                    work.append((successor, 0))
+                elif on_stack[successor]:
+                    low[vertex] = min(low[vertex], index[successor])
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[vertex])
+            if low[vertex] == index[vertex]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == vertex:
+                        break
+                components.append(component)
+
+    return components
+
+
+def find_deadlocks(tables):
+    """Return (safe sequence, deadlocked processes, deadlock cycles) for single-instance resources.
+
+    A process is deadlocked when it is part of a cycle, can never get a resource, or waits
+    (directly or not) on such a process. Each cycle lists the processes of one circular wait,
+    cycles sorted by their lowest process.
+    The safe sequence runs the lowest-numbered process whose holders have all finished first,
+    the order of the Banker's safety loop.
+    """
+    graph, impossible = build_wait_for_graph(tables)
+    components = strongly_connected_components(graph)
+
+    component_of = [0] * len(graph)
+    for number, component in enumerate(components):
+        for process in component:
+            component_of[process] = number
+
+    doomed = [False] * len(components)
+    safe = []
+    cycles = []
+    for number, component in enumerate(components):
+        process = component[0]
+        if len(component) > 1 or process in graph[process]:
+            cycles.append(sorted(component))
+            doomed[number] = True
+        elif impossible[process] or any(doomed[component_of[other]] for other in graph[process]):
+            doomed[number] = True
+        else:
+            safe.append(process)  # Everything it waits for can finish
+
+    waiting_count = [0] * len(graph)
+    waiters = [[] for _ in graph]
+    for process in safe:
+        for other in graph[process]:
+            waiting_count[process] += 1
+            waiters[other].append(process)
+    ready = [process for process in safe if not waiting_count[process]]
+    heapq.heapify(ready)
+    safe_sequence = []
+    while ready:
+        process = heapq.heappop(ready)
+        safe_sequence.append(process)
+        for waiter in waiters[process]:
+            waiting_count[waiter] -= 1
+            if not waiting_count[waiter]:
+                heapq.heappush(ready, waiter)
+
+    deadlocked = [process for process in range(len(graph)) if doomed[component_of[process]]]
+    return safe_sequence, deadlocked, sorted(cycles)
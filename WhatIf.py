@@ -0,0 +1,208 @@
+"""What-if analysis: evaluate many small variants of one scenario without rebuilding it.
+
+A variant is a list of deltas applied to the base scenario's tables:
+
+    {"op": "add_disponibilities", "resource": 1, "amount": 2}
+    {"op": "set_disponibilities", "resource": 1, "value": 4}
+    {"op": "add_edge", "start_node": {"type": "P", "number": 3}, "end_node": {"type": "R", "number": 0}}
+    {"op": "remove_edge", "start_node": {"type": "R", "number": 0}, "end_node": {"type": "P", "number": 3}, "count": 2}
+
+Edges follow the GUI rules: P -> R is a request, R -> P an allocation, which needs a free
+instance. Variants share the base Allocation/Need rows and only copy the rows a delta
+changes, and a batch is spread over a process pool like BatchAnalyzer.
+
+Usage:
+    python WhatIf.py scenarios/activities_scenario.json variants.jsonl --output results.jsonl
+    python WhatIf.py scenarios/activities_scenario.json --sensitivity
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from DeadlockEngine import AnalysisResult, ResourceTables, detect, finish_in_order, load_tables, sparse_rows
+from ScenarioStream import iter_jsonl_records, node_key
+
+
+class WhatIf:
+    def __init__(self, tables, mode="auto", backend="python"):
+        if not isinstance(tables.allocated, list):
+            # NumPy tables from a binary scenario: rows are copied as lists when a delta touches them
+            tables = ResourceTables(tables.allocated.tolist(), tables.needed.tolist(),
+                                    list(map(int, tables.available)), list(map(int, tables.total)))
+        self.base = tables
+        self.mode = mode
+        self.backend = backend
+
+    def apply(self, deltas):
+        """Tables of the base scenario with deltas applied; unchanged rows are shared with the base."""
+        base = self.base
+        allocated, needed = base.allocated, base.needed
+        copied = set()  # (table name, process) rows already copied for this variant
+        available, total = list(base.available), list(base.total)
+
+        def row(table, name, process):
+            if (name, process) not in copied:
+                table[process] = list(table[process])
+                copied.add((name, process))
+            return table[process]
+
+        for delta in deltas:
+            op = delta["op"]
+            if op in ("add_disponibilities", "set_disponibilities"):
+                j = delta["resource"]
+                change = delta["amount"] if op == "add_disponibilities" else delta["value"] - total[j]
+                if total[j] + change < total[j] - available[j]:
+                    raise ValueError(f"R{j} cannot have fewer disponibilities than the {total[j] - available[j]} allocated")
+                total[j] += change
+                available[j] += change
+            elif op in ("add_edge", "remove_edge"):
+                count = delta.get("count", 1)
+                if op == "remove_edge":
+                    count = -count
+                start_type, start_number = node_key(delta["start_node"])
+                end_type, end_number = node_key(delta["end_node"])
+                if start_type == "R" and end_type == "P":
+                    if allocated is base.allocated:
+                        allocated = list(allocated)
+                    target = row(allocated, "allocated", end_number)
+                    if count > available[start_number]:
+                        raise ValueError(f"R{start_number} has no free instance for P{end_number}")
+                    available[start_number] -= count
+                    resource = start_number
+                elif start_type == "P" and end_type == "R":
+                    if needed is base.needed:
+                        needed = list(needed)
+                    target = row(needed, "needed", start_number)
+                    resource = end_number
+                else:
+                    raise ValueError("Invalid edge connection.")
+                if target[resource] + count < 0:
+                    raise ValueError(f"No {start_type}{start_number} -> {end_type}{end_number} edge to remove")
+                target[resource] += count
+            else:
+                raise ValueError(f"Unknown what-if operation: {op}")
+        return ResourceTables(allocated, needed, available, total)
+
+    def evaluate(self, deltas):
+        return detect(self.apply(deltas), self.mode, self.backend)
+
+    def evaluate_all(self, variants, workers=None, chunksize=8):
+        """Evaluate a list of variants (each a list of deltas); returns one record per variant, in order.
+
+        A variant with an invalid delta gets an "error" instead of a result.
+        """
+        if workers == 1:
+            return [self._record(deltas) for deltas in variants]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_install, initargs=(self,)) as executor:
+            return list(executor.map(_evaluate_job, variants, chunksize=chunksize))
+
+    def _record(self, deltas):
+        try:
+            record = self.evaluate(deltas).to_dict()
+            record["error"] = None
+        except (ValueError, KeyError, IndexError) as error:
+            record = AnalysisResult.error_record(error)
+        return record
+
+    def sensitivity(self):
+        """Per resource, the fewest extra instances that make the system safe on their own.
+
+        None when no number of extra instances of that resource is enough. More instances
+        never hurt, so each resource is a binary search up to the largest request for it.
+        """
+        base = self.base
+        allocated, needed = sparse_rows(base.allocated), sparse_rows(base.needed)
+        processes = list(range(base.processes))
+        report = []
+        for j in range(base.resources):
+            def safe_with(extra):
+                available = list(base.available)
+                available[j] += extra
+                return not finish_in_order(allocated, needed, available, processes)[1]
+
+            # With the largest request available from the start, this resource blocks nobody
+            high = max([row[j] for row in base.needed] + [0]) - base.available[j]
+            high = max(high, 0)
+            if not safe_with(high):
+                report.append({"resource": j, "extra_disponibilities": None})
+                continue
+            low = 0
+            while low < high:
+                middle = (low + high) // 2
+                if safe_with(middle):
+                    high = middle
+                else:
+                    low = middle + 1
+            report.append({"resource": j, "extra_disponibilities": low})
+        return report
+
+
+_what_if = None  # The WhatIf of a pool worker, sent once per worker instead of once per variant
+
+
+def _install(what_if):
+    global _what_if
+    _what_if = what_if
+
+
+def _evaluate_job(deltas):
+    return _what_if._record(deltas)
+
+
+def diff_tables(base, other):
+    """Deltas that turn base into other (same processes and resources)."""
+    if (base.processes, base.resources) != (other.processes, other.resources):
+        raise ValueError("Scenarios with different processes or resources cannot be diffed")
+    changes = []
+    for i in range(base.processes):
+        for j in range(base.resources):
+            allocated = other.allocated[i][j] - base.allocated[i][j]
+            needed = other.needed[i][j] - base.needed[i][j]
+            if allocated:
+                changes.append((allocated, {"type": "R", "number": j}, {"type": "P", "number": i}))
+            if needed:
+                changes.append((needed, {"type": "P", "number": i}, {"type": "R", "number": j}))
+    # Removals first, then the new disponibilities, then additions: instances are freed
+    # before a resource shrinks and added before new allocations use them
+    deltas = [{"op": "remove_edge", "start_node": start, "end_node": end, "count": -change}
+              for change, start, end in changes if change < 0]
+    deltas += [{"op": "set_disponibilities", "resource": j, "value": other.total[j]}
+               for j in range(base.resources) if other.total[j] != base.total[j]]
+    deltas += [{"op": "add_edge", "start_node": start, "end_node": end, "count": change}
+               for change, start, end in changes if change > 0]
+    return deltas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate what-if variants of a scenario.")
+    parser.add_argument("scenario", help="base .json, .jsonl or .dlkb scenario")
+    parser.add_argument("variants", nargs="?",
+                        help='JSON Lines file, one {"name": ..., "deltas": [...]} object per variant')
+    parser.add_argument("-o", "--output", help="output file (default: standard output)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU, 1 runs in-process)")
+    parser.add_argument("--backend", choices=("python", "numpy"), default="python")
+    parser.add_argument("--mode", choices=("auto", "matrix", "wait-for"), default="auto")
+    parser.add_argument("--sensitivity", action="store_true",
+                        help="report the extra disponibilities per resource that make the base safe")
+    args = parser.parse_args(argv)
+
+    what_if = WhatIf(load_tables(args.scenario), args.mode, args.backend)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        if args.variants:
+            variants = list(iter_jsonl_records(args.variants))
+            records = what_if.evaluate_all([variant["deltas"] for variant in variants], args.workers)
+            for variant, record in zip(variants, records):
+                output.write(json.dumps({"name": variant.get("name"), **record}) + "\n")
+        if args.sensitivity:
+            for entry in what_if.sensitivity():
+                output.write(json.dumps(entry) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""BackgroundTask's delivery on a stand-in for the Tk root."""
+import time
+
+from BackgroundTask import BackgroundTask
+
+
+class Root:
+    """Runs root.after callbacks in order, waiting on the worker between polls."""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, function, *args):
+        self.pending.append((function, args))
+
+    def run(self, limit=10000):
+        while self.pending and limit:
+            function, args = self.pending.pop(0)
+            time.sleep(0.001)
+            function(*args)
+            limit -= 1
+
+
+def send_items(task):
+    for item in range(20):
+        task.send(item)
+    return "done"
+
+
+def test_items_then_result():
+    root, items, outcome = Root(), [], []
+    BackgroundTask(root, send_items, on_done=outcome.append, on_item=items.append, max_pending=2).start()
+    root.run()
+    assert items == list(range(20)) and outcome == ["done"]
+
+
+def test_failing_on_item_ends_the_task():
+    root, errors, outcome = Root(), [], []
+
+    def on_item(item):
+        if item == 3:
+            raise TypeError("bad record")
+
+    task = BackgroundTask(root, send_items, on_done=outcome.append, on_item=on_item, on_error=errors.append,
+                          max_pending=2).start()
+    root.run()
+    task.thread.join(1)
+    assert [str(error) for error in errors] == ["bad record"] and not outcome
+    assert not task.thread.is_alive() and not root.pending
+
+
+def test_cancel_runs_on_cancel_at_once():
+    root, cancelled, outcome = Root(), [], []
+    task = BackgroundTask(root, send_items, on_done=outcome.append, on_item=lambda item: None,
+                          on_cancel=lambda: cancelled.append(True), max_pending=2).start()
+    task.cancel()
+    assert cancelled == [True]
+    root.run()
+    task.thread.join(1)
+    assert cancelled == [True] and not outcome and not task.thread.is_alive()
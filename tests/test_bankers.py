@@ -0,0 +1,69 @@
+"""Bankers.run against the recursive loop it replaced, which restarted from the first process."""
+import random
+
+import pytest
+
+import Bankers
+from Bankers import Info, as_vector
+
+
+def old_run(state, resource_amount):
+    """The original solver: grant the first process that fits, drop it, start over."""
+    state, order = list(state), []
+    while state:
+        allocated = as_vector(Bankers.calc_allocated_resources(state))
+        remaining = [total - held for total, held in zip(as_vector(resource_amount), allocated)]
+        try:
+            info = Bankers.find_desired(state, remaining)
+        except ValueError:
+            break
+        order.append(info)
+        state = Bankers.remove(state, info)
+    return order, state
+
+
+def names(infos):
+    return [info.process_name for info in infos]
+
+
+def random_state(rng, resources):
+    """A state for resources resource types (0: single numbers) and the amount it fits in."""
+    width = resources or 1
+    has = [[rng.randint(0, 3) for _ in range(width)] for _ in range(rng.randint(1, 12))]
+    total = [sum(column) + rng.randint(0, 4) for column in zip(*has)]
+    maximum = [[held + rng.randint(0, 6) for held in holding] for holding in has]
+    if not resources:
+        return [Info(f"P{i}", h[0], m[0]) for i, (h, m) in enumerate(zip(has, maximum))], total[0]
+    return [Info(f"P{i}", h, m) for i, (h, m) in enumerate(zip(has, maximum))], total
+
+
+def test_worked_example():
+    result = Bankers.run(Bankers.original_state, Bankers.resource_amount)
+    assert result.safe and names(result.sequence) == ["B", "C", "A"]
+
+
+@pytest.mark.parametrize("resources", [0, 1, 3])
+@pytest.mark.parametrize("seed", range(200))
+def test_same_order_as_the_old_loop(resources, seed):
+    state, total = random_state(random.Random(seed), resources)
+    order, stuck = old_run(state, total)
+    result = Bankers.run(state, total)
+    assert names(result.sequence) == names(order)
+    assert names(result.remaining) == names(stuck)
+
+
+def test_multi_resource_case():
+    state = [Info("C", [0, 1, 2], [1, 3, 2]), Info("B", [1, 2, 0], [3, 2, 2]), Info("A", [1, 0, 1], [2, 1, 1]),
+             Info("D", [0, 0, 0], [5, 0, 0])]
+    result = Bankers.run(state, [4, 4, 4])
+    # Available starts at [2, 1, 1]: only A fits, its release lets B run, and B's lets C run;
+    # D wants more of the first resource than there is
+    assert names(result.sequence) == ["A", "B", "C"]
+    assert result.granted == [[1, 1, 0], [2, 0, 2], [1, 2, 0]]
+    assert names(result.remaining) == ["D"]
+    assert (names(result.sequence), names(result.remaining)) == tuple(map(names, old_run(state, [4, 4, 4])))
+
+
+def test_resource_amount_is_required():
+    with pytest.raises(TypeError):
+        Bankers.run(Bankers.original_state)
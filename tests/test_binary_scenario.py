@@ -0,0 +1,84 @@
+"""The .dlkb writer and reader, with and without NumPy, against tables built from the JSON records."""
+import random
+
+import pytest
+
+import BinaryScenario
+from BinaryScenario import HEADER, export_graph, export_records, iter_binary_records
+from DeadlockEngine import graph_from_scenario, tables_from_records
+from ScenarioGenerator import generate_scenario
+from ScenarioStream import iter_scenario_records
+
+BACKENDS = ["numpy", "memoryview"]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(BinaryScenario, "has_numpy", lambda: False)
+    return request.param
+
+
+def scenario(seed):
+    """A generated scenario plus random edges, some of them grants beyond a resource's disponibilities."""
+    rng = random.Random(seed)
+    graph = generate_scenario(rng.randint(1, 40), rng.randint(1, 8), instances=(1, 3), deadlock=False, seed=seed)
+    processes = [node for node in graph["nodes"] if node["type"] == "P"]
+    resources = [node for node in graph["nodes"] if node["type"] == "R"]
+    for _ in range(rng.randint(0, 30)):
+        process = {"type": "P", "number": rng.choice(processes)["number"]}
+        resource = {"type": "R", "number": rng.choice(resources)["number"]}
+        pair = (resource, process) if rng.random() < 0.5 else (process, resource)
+        graph["edges"].insert(rng.randint(0, len(graph["edges"])), {"start_node": pair[0], "end_node": pair[1]})
+    return graph
+
+
+def as_lists(matrices):
+    return [matrix.tolist() if hasattr(matrix, "tolist") else list(matrix) for matrix in matrices]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_round_trip(tmp_path, backend, seed):
+    graph = scenario(seed)
+    expected = tables_from_records(iter_scenario_records(graph))
+    path = str(tmp_path / "scenario.dlkb")
+    export_records(iter_scenario_records(graph), path)
+
+    with BinaryScenario.BinaryScenario(path) as binary:
+        matrices = as_lists(binary.matrices())
+    assert matrices == [expected.allocated, expected.needed, expected.available, expected.total]
+    assert list(iter_binary_records(path)) == list(iter_scenario_records(graph))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_export_graph_matches_export_records(tmp_path, backend, seed):
+    graph = scenario(seed)
+    nodes, edges = graph_from_scenario(graph)
+    path = str(tmp_path / "graph.dlkb")
+    export_graph(nodes, edges, path)
+    expected = tables_from_records(iter_scenario_records(graph))
+    with BinaryScenario.BinaryScenario(path) as binary:
+        assert as_lists(binary.matrices()) == [expected.allocated, expected.needed, expected.available,
+                                               expected.total]
+
+
+def test_truncated_file_is_rejected(tmp_path, backend):
+    path = tmp_path / "scenario.dlkb"
+    export_records(iter_scenario_records(scenario(1)), str(path))
+    data = path.read_bytes()
+    for size in (len(data) - 4, HEADER.size + 1, HEADER.size - 1):
+        path.write_bytes(data[:size])
+        with pytest.raises(ValueError):
+            BinaryScenario.BinaryScenario(str(path))
+
+
+@pytest.mark.parametrize("header", [b"NOPE", b"DLKB\x02\x00"])
+def test_bad_header_is_rejected(tmp_path, backend, header):
+    path = tmp_path / "scenario.dlkb"
+    export_records(iter_scenario_records(scenario(1)), str(path))
+    data = path.read_bytes()
+    path.write_bytes(header + data[len(header):])
+    with pytest.raises(ValueError):
+        BinaryScenario.BinaryScenario(str(path))
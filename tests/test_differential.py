@@ -0,0 +1,144 @@
+"""Every fast path against the reference safety loop, find_safe_sequence, on generated scenarios."""
+import random
+
+import pytest
+
+from AnalysisCache import AnalysisCache
+from DeadlockEngine import (ResourceTables, detect, find_safe_sequence, find_safe_sequence_sorted, graph_from_scenario,
+                            tables_from_records)
+from IncrementalDetector import IncrementalDetector, SAFE
+from ScenarioGenerator import generate_scenario
+from ScenarioStream import iter_scenario_records
+
+SEEDS = range(12)
+SHAPES = [
+    dict(processes=30, resources=6, instances=(1, 4), density=0.15),
+    dict(processes=40, resources=8, instances=(1, 3), density=0.1, deadlock=True),
+    dict(processes=25, resources=5, instances=2, density=0.2, adversarial=True),
+]
+SINGLE = [
+    dict(processes=30, resources=10, instances=1, density=0.1),
+    dict(processes=30, resources=10, instances=1, density=0.1, deadlock=True),
+]
+# The generator only ever blocks its planted ring; random edges also strand processes behind it
+SHAPES.append(dict(processes=30, resources=6, instances=(1, 3), edges=90, random=True))
+SINGLE.append(dict(processes=30, resources=10, instances=1, edges=60, random=True))
+
+
+def scenario(shape, seed):
+    if not shape.get("random"):
+        return generate_scenario(seed=seed, **shape)
+    rng = random.Random(seed)
+    instances = shape["instances"]
+    if isinstance(instances, int):
+        instances = (instances, instances)
+    nodes = [{"type": "P", "number": i} for i in range(shape["processes"])]
+    nodes += [{"type": "R", "number": j, "disponibilities": rng.randint(*instances)} for j in range(shape["resources"])]
+    edges = []
+    for _ in range(shape["edges"]):
+        process = {"type": "P", "number": rng.randrange(shape["processes"])}
+        resource = {"type": "R", "number": rng.randrange(shape["resources"])}
+        # Grants beyond a resource's disponibilities are dropped on import, as in the GUI
+        if rng.random() < 0.5:
+            edges.append({"start_node": resource, "end_node": process})
+        else:
+            edges.append({"start_node": process, "end_node": resource})
+    return {"nodes": nodes, "edges": edges}
+
+
+def scenario_tables(graph):
+    return tables_from_records(iter_scenario_records(graph))
+
+
+def permuted(tables, rng):
+    """The same state with its processes and resources numbered differently."""
+    processes, resources = list(range(tables.processes)), list(range(tables.resources))
+    rng.shuffle(processes)
+    rng.shuffle(resources)
+    return ResourceTables([[tables.allocated[i][j] for j in resources] for i in processes],
+                          [[tables.needed[i][j] for j in resources] for i in processes],
+                          [tables.available[j] for j in resources], [tables.total[j] for j in resources])
+
+
+def assert_runnable(tables, sequence, preempted=()):
+    """Each process of sequence fits in what the ones before it, and the preempted ones, gave back."""
+    work = list(tables.available)
+    for process in preempted:
+        for j in range(tables.resources):
+            work[j] += tables.allocated[process][j]
+    for process in sequence:
+        assert all(tables.needed[process][j] <= work[j] for j in range(tables.resources)), process
+        for j in range(tables.resources):
+            work[j] += tables.allocated[process][j]
+
+
+def assert_same_analysis(tables, result, reference):
+    assert sorted(result.deadlocked) == sorted(reference.deadlocked)
+    assert sorted(result.safe_sequence) == sorted(reference.safe_sequence)
+    assert_runnable(tables, result.safe_sequence)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("shape", SHAPES + SINGLE)
+def test_numpy_backend(shape, seed):
+    pytest.importorskip("numpy")
+    tables = scenario_tables(scenario(shape, seed))
+    assert_same_analysis(tables, detect(tables, "matrix", "numpy"), find_safe_sequence(tables))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("shape", SHAPES + SINGLE)
+def test_sorted_pass(shape, seed):
+    tables = scenario_tables(scenario(shape, seed))
+    result, reference = find_safe_sequence_sorted(tables), find_safe_sequence(tables)
+    assert result.safe_sequence == reference.safe_sequence
+    assert sorted(result.deadlocked) == sorted(reference.deadlocked)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("shape", SINGLE)
+def test_wait_for_graph(shape, seed):
+    tables = scenario_tables(scenario(shape, seed))
+    result, reference = detect(tables, "wait-for"), find_safe_sequence(tables)
+    assert result.safe_sequence == reference.safe_sequence
+    assert sorted(result.deadlocked) == sorted(reference.deadlocked)
+    assert all(set(cycle) <= set(result.deadlocked) for cycle in result.cycles)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("shape", SHAPES + SINGLE)
+def test_incremental_detector(shape, seed):
+    graph = scenario(shape, seed)
+    tables, reference = scenario_tables(graph), find_safe_sequence(scenario_tables(graph))
+    detector = IncrementalDetector()
+    nodes, edges = graph_from_scenario(graph)
+    for node in nodes:
+        detector.add_node(node)
+    for edge in edges:
+        detector.add_edge(edge)
+    assert (detector.status() == SAFE) == reference.safe
+    assert sorted(process.number for process in detector.deadlocked()) == sorted(reference.deadlocked)
+    assert_runnable(tables, [process.number for process in detector.safe_sequence()])
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("mode, backend", [("auto", "python"), ("matrix", "python"), ("matrix", "numpy")])
+def test_analysis_cache(mode, backend, seed):
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    rng = random.Random(seed)
+    cache = AnalysisCache()
+    for shape in SHAPES + SINGLE:
+        tables = scenario_tables(scenario(shape, seed))
+        # The renumbered copies hit the entry the first one stored
+        for variant in (tables, permuted(tables, rng), permuted(tables, rng)):
+            result, plan = cache.analyze(variant, mode, backend)
+            reference = find_safe_sequence(variant)
+            assert result.to_dict() == detect(variant, mode, backend).to_dict()
+            assert_same_analysis(variant, result, reference)
+            assert (plan is None) == reference.safe
+            if plan is not None:
+                assert set(plan.victims) <= set(reference.deadlocked)
+                assert sorted(plan.safe_sequence + plan.victims) == list(range(variant.processes))
+                assert_runnable(variant, plan.safe_sequence, plan.victims)
+    assert cache.hits > 0
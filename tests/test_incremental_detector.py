@@ -0,0 +1,77 @@
+"""IncrementalDetector.can_grant against granting the request and running find_safe_sequence."""
+import copy
+import random
+
+import pytest
+
+import IncrementalDetector as incremental
+from DeadlockEngine import ResourceTables, find_safe_sequence
+from IncrementalDetector import IncrementalDetector
+
+STATE = ("capacity", "available", "allocated", "needed", "holders", "requesters", "position", "work",
+         "blocked_on", "waiting_count", "contended", "state", "entries")
+
+
+def safe_after_grant(detector, resource, process, units):
+    """Reference answer: apply the grant to a copy of the tables and run the safety loop."""
+    if detector.available[resource] < units:
+        return False
+    processes, resources = list(detector.allocated), list(detector.capacity)
+    allocated = [[detector.allocated[i].get(j, 0) for j in resources] for i in processes]
+    needed = [[detector.needed[i].get(j, 0) for j in resources] for i in processes]
+    available = [detector.available[j] for j in resources]
+    allocated[processes.index(process)][resources.index(resource)] += units
+    available[resources.index(resource)] -= units
+    total = [detector.capacity[j] for j in resources]
+    return find_safe_sequence(ResourceTables(allocated, needed, available, total)).safe
+
+
+def random_events(rng, detector, steps):
+    """Requests, grants and releases on a small random system; yields after each event."""
+    processes = [("P", i) for i in range(rng.randint(4, 12))]
+    resources = [("R", j) for j in range(rng.randint(2, 5))]
+    for process in processes:
+        detector.add_process(process)
+    for resource in resources:
+        detector.add_resource(resource, rng.randint(1, 4))
+    for _ in range(steps):
+        process, resource = rng.choice(processes), rng.choice(resources)
+        event = rng.random()
+        if event < 0.45:
+            detector.request(process, resource)
+            if detector.state != incremental.SAFE and rng.random() < 0.8:
+                detector.cancel_request(process, resource)  # Mostly stay safe, where can_grant has work to do
+        elif event < 0.8:
+            if detector.available[resource] >= 1:
+                detector.grant(resource, process)
+        elif detector.allocated[process].get(resource):
+            detector.release(resource, process)
+        yield processes, resources
+
+
+def check_queries(seed, queries=4):
+    rng = random.Random(seed)
+    detector = IncrementalDetector()
+    for processes, resources in random_events(rng, detector, 120):
+        for _ in range(queries):
+            process, resource, units = rng.choice(processes), rng.choice(resources), rng.choice((1, 1, 2))
+            before = {name: copy.deepcopy(getattr(detector, name)) for name in STATE}
+            assert detector.can_grant(resource, process, units) == safe_after_grant(detector, resource, process, units)
+            assert {name: getattr(detector, name) for name in STATE} == before
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_can_grant_matches_safety_loop(seed):
+    check_queries(seed)
+
+
+def test_can_grant_falls_back_to_a_sorted_pass(monkeypatch):
+    # A huge step cost leaves no budget, so every replay gives way to the sorted pass
+    monkeypatch.setattr(incremental, "REPLAY_STEP_COST", 10 ** 9)
+    calls = []
+    safe_with = IncrementalDetector._safe_with
+    monkeypatch.setattr(IncrementalDetector, "_safe_with",
+                        lambda detector, *grant: calls.append(grant) or safe_with(detector, *grant))
+    for seed in range(10):
+        check_queries(seed)
+    assert calls
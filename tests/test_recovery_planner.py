@@ -0,0 +1,89 @@
+"""RecoveryPlanner's branch-and-bound against its greedy bound and a brute-force search."""
+import itertools
+import random
+
+import pytest
+
+from DeadlockEngine import ResourceTables, find_safe_sequence
+from RecoveryPlanner import RecoveryPlanner, plan_recovery
+
+
+def random_tables(rng, processes, resources):
+    total = [rng.randint(1, 4) for _ in range(resources)]
+    available = list(total)
+    allocated = [[0] * resources for _ in range(processes)]
+    needed = [[0] * resources for _ in range(processes)]
+    for _ in range(processes * 3):
+        i, j = rng.randrange(processes), rng.randrange(resources)
+        if available[j] and rng.random() < 0.6:
+            allocated[i][j] += 1
+            available[j] -= 1
+        else:
+            needed[i][j] += 1
+    return ResourceTables(allocated, needed, available, total)
+
+
+def preempted(tables, victims):
+    """The tables once the victims gave back everything they hold and left."""
+    available = list(tables.available)
+    allocated, needed = [], []
+    for process in range(tables.processes):
+        if process in victims:
+            available = [amount + held for amount, held in zip(available, tables.allocated[process])]
+            allocated.append([0] * len(available))
+            needed.append([0] * len(available))
+        else:
+            allocated.append(list(tables.allocated[process]))
+            needed.append(list(tables.needed[process]))
+    return ResourceTables(allocated, needed, available, list(tables.total))
+
+
+def brute_force_cost(tables, costs):
+    best = None
+    for size in range(tables.processes + 1):
+        for victims in itertools.combinations(range(tables.processes), size):
+            if find_safe_sequence(preempted(tables, set(victims))).safe:
+                cost = sum(costs[process] for process in victims)
+                if best is None or cost < best:
+                    best = cost
+    return best
+
+
+@pytest.mark.parametrize("seed", range(150))
+def test_plan_is_optimal(seed):
+    rng = random.Random(seed)
+    tables = random_tables(rng, rng.randint(1, 7), rng.randint(1, 3))
+    costs = [rng.randint(0, 5) for _ in range(tables.processes)] if seed % 2 else None
+    planner = RecoveryPlanner(tables, costs)
+    plan = planner.plan()
+    assert plan.optimal
+    assert plan.cost == brute_force_cost(tables, planner.costs)
+    assert plan.cost == sum(planner.costs[process] for process in plan.victims)
+
+    # The victims really are enough, in the order the plan gives
+    victims = set(plan.victims)
+    assert sorted(plan.safe_sequence + plan.victims) == list(range(tables.processes))
+    work = list(preempted(tables, victims).available)
+    for process in plan.safe_sequence:
+        assert all(have >= need for have, need in zip(work, tables.needed[process]))
+        work = [have + held for have, held in zip(work, tables.allocated[process])]
+
+    # Never worse than the greedy plan the search starts from
+    _, deadlocked, work = planner.finish(tables.available, list(range(tables.processes)))
+    if deadlocked:
+        assert plan.cost <= sum(planner.costs[process] for process in planner.greedy(work, deadlocked))
+    else:
+        assert plan.victims == [] and plan.cost == 0
+
+
+def test_deadlocked_pair():
+    # Each process holds the unit the other one needs
+    tables = ResourceTables([[1, 0], [0, 1]], [[0, 1], [1, 0]], [0, 0], [1, 1])
+    assert plan_recovery(tables).victims == [0]
+    assert plan_recovery(tables, {0: 3, 1: 2}).victims == [1]
+
+
+def test_negative_cost_rejected():
+    tables = ResourceTables([[1]], [[0]], [0], [1])
+    with pytest.raises(ValueError):
+        RecoveryPlanner(tables, [-1])
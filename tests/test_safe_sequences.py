@@ -0,0 +1,75 @@
+"""SafeSequenceSearch against brute force over every order of small tables."""
+import itertools
+import random
+
+import pytest
+
+from DeadlockEngine import ResourceTables
+from SafeSequences import SafeSequenceSearch
+
+
+def random_tables(rng, processes, resources):
+    total = [rng.randint(1, 4) for _ in range(resources)]
+    available = list(total)
+    allocated = [[0] * resources for _ in range(processes)]
+    needed = [[0] * resources for _ in range(processes)]
+    for _ in range(processes * 2):
+        i, j = rng.randrange(processes), rng.randrange(resources)
+        if available[j] and rng.random() < 0.5:
+            allocated[i][j] += 1
+            available[j] -= 1
+        elif rng.random() < 0.5:
+            needed[i][j] += 1
+    return ResourceTables(allocated, needed, available, total)
+
+
+def all_safe_sequences(tables):
+    """Every order in which each process's need fits once the ones before it finished."""
+    found = []
+    for order in itertools.permutations(range(tables.processes)):
+        work = list(tables.available)
+        for process in order:
+            if any(need > have for need, have in zip(tables.needed[process], work)):
+                break
+            work = [have + held for have, held in zip(work, tables.allocated[process])]
+        else:
+            found.append(list(order))
+    return found
+
+
+@pytest.mark.parametrize("seed", range(120))
+def test_matches_permutations(seed):
+    rng = random.Random(seed)
+    tables = random_tables(rng, rng.randint(1, 6), rng.randint(1, 3))
+    expected = all_safe_sequences(tables)
+    search = SafeSequenceSearch(tables)
+
+    assert search.count() == len(expected)
+    assert list(search.sequences()) == expected  # Permutations come out in lexicographic order
+    assert list(search.sequences(limit=3)) == expected[:3]
+
+    weights = [[rng.randint(0, 9) for _ in range(tables.processes)] for _ in range(tables.processes)]
+
+    def cost(process, position):
+        return weights[process][position]
+
+    sequence, total = search.best(cost)
+    if not expected:
+        assert (sequence, total) == (None, None)
+        assert search.earliest(0) is None
+        return
+    assert sequence in expected
+    assert total == sum(cost(process, position) for position, process in enumerate(sequence))
+    assert total == min(sum(cost(process, position) for position, process in enumerate(order))
+                        for order in expected)
+
+    for target in range(tables.processes):
+        sequence = search.earliest(target)
+        assert sequence in expected
+        assert sequence.index(target) == min(order.index(target) for order in expected)
+
+
+def test_idle_processes_counted_once_each():
+    # Three processes that hold and need nothing can run in any of 3! orders
+    tables = ResourceTables([[0]] * 3, [[0]] * 3, [1], [1])
+    assert SafeSequenceSearch(tables).count() == 6
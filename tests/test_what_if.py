@@ -0,0 +1,66 @@
+"""WhatIf's deltas, diff_tables and sensitivity against tables built directly."""
+import random
+
+import pytest
+
+from DeadlockEngine import AnalysisResult, ResourceTables, detect, find_safe_sequence
+from WhatIf import WhatIf, diff_tables
+
+
+def random_tables(rng, processes, resources):
+    total = [rng.randint(1, 4) for _ in range(resources)]
+    available = list(total)
+    allocated = [[0] * resources for _ in range(processes)]
+    needed = [[0] * resources for _ in range(processes)]
+    for _ in range(processes * 2):
+        i, j = rng.randrange(processes), rng.randrange(resources)
+        if available[j] and rng.random() < 0.5:
+            allocated[i][j] += 1
+            available[j] -= 1
+        else:
+            needed[i][j] += 1
+    return ResourceTables(allocated, needed, available, total)
+
+
+def rows(tables):
+    return tables.allocated, tables.needed, list(tables.available), list(tables.total)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_diff_applies_back(seed):
+    rng = random.Random(seed)
+    processes, resources = rng.randint(1, 10), rng.randint(1, 5)
+    base, other = random_tables(rng, processes, resources), random_tables(rng, processes, resources)
+    before = [[list(row) for row in table] for table in (base.allocated, base.needed)]
+    what_if = WhatIf(base)
+    assert rows(what_if.apply(diff_tables(base, other))) == rows(other)
+    assert [base.allocated, base.needed] == before  # Variants copy the rows they change
+    assert what_if.evaluate(diff_tables(base, other)).to_dict() == detect(other).to_dict()
+
+
+def test_invalid_delta_gets_an_error_record():
+    what_if = WhatIf(random_tables(random.Random(1), 3, 2))
+    records = what_if.evaluate_all([[{"op": "add_edge", "start_node": {"type": "P", "number": 0},
+                                      "end_node": {"type": "P", "number": 1}}]], workers=1)
+    assert records == [AnalysisResult.error_record(ValueError("Invalid edge connection."))]
+    assert set(records[0]) == set(AnalysisResult([], []).to_dict()) | {"error"}
+
+
+def safe_with_extra(tables, resource, extra):
+    available = list(tables.available)
+    available[resource] += extra
+    return find_safe_sequence(ResourceTables(tables.allocated, tables.needed, available, tables.total)).safe
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_sensitivity_is_the_fewest_extra_instances(seed):
+    tables = random_tables(random.Random(seed), 8, 3)
+    report = WhatIf(tables).sensitivity()
+    assert [entry["resource"] for entry in report] == [0, 1, 2]
+    for entry in report:
+        extra = entry["extra_disponibilities"]
+        if extra is None:
+            assert not safe_with_extra(tables, entry["resource"], 1000)
+        else:
+            assert safe_with_extra(tables, entry["resource"], extra)
+            assert extra == 0 or not safe_with_extra(tables, entry["resource"], extra - 1)